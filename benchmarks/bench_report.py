@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# json encoding of a full RasPySampleLogger report per sample,
+# re-encoding all arrays compared to the cached fragments
+#
+# python benchmarks/bench_report.py
+import os
+import sys
+import timeit
+import simplejson as json
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_samplelogger import samples, MAXLOG, WINDOWS
+from raspysystem.raspysamplelogger import RasPySampleLogger
+
+SEPARATORS = (",", ":")
+
+
+def full(logger):
+    report = logger.serialize()
+    report["samples"] = logger._samples.to_list()
+    report["avgsamples"] = logger._avgsamples.to_list()
+    return json.dumps(report, separators=SEPARATORS)
+
+
+def cached(logger):
+    return json.dumps(logger.serialize(), separators=SEPARATORS)
+
+
+def bench(encode, data):
+    logger = RasPySampleLogger(MAXLOG, list(WINDOWS))
+    for i in range(MAXLOG):
+        logger.log(i * 60, data[i])
+
+    def run():
+        for i in range(MAXLOG, len(data)):
+            logger.log(i * 60, data[i])
+            encode(logger)
+    return min(timeit.repeat(run, number=1, repeat=1))
+
+
+if __name__ == "__main__":
+    data = samples(2 * MAXLOG)
+    count = len(data) - MAXLOG
+
+    tfull = bench(full, data)
+    tcached = bench(cached, data)
+    print("full:   {:.1f} us/report".format(tfull * 1e6 / count))
+    print("cached: {:.1f} us/report".format(tcached * 1e6 / count))
+    print("speedup: {:.1f}x".format(tfull / tcached))
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# compares the incremental RasPySampleLogger against
+# the previous implementation, which recalculated every window
+# from scratch on every sample
+#
+# python benchmarks/bench_samplelogger.py
+import os
+import sys
+import random
+import timeit
+from math import fsum
+from collections import deque
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from raspysystem.raspysamplelogger import RasPySampleLogger
+
+MAXLOG = 1440
+WINDOWS = [5, 15, 60]
+
+
+class LegacySampleLogger(object):
+
+    def __init__(self, maxlog, windows=list()):
+        self._windows = windows + [maxlog]
+        self._samples_list = list()
+        self._samples = deque(maxlen=maxlog)
+        self._averages = [None for _ in self._windows]
+        self._ranges = [[None, None] for _ in self._windows]
+        self._avgsamples = deque(maxlen=maxlog)
+        self._timestamps = deque(maxlen=maxlog)
+        self._mintime = None
+        self._maxtime = None
+
+    def log(self, timestamp, sample):
+        self._timestamps.append(timestamp)
+        self._samples.append(sample)
+        self._samples_list = [x for x in self._samples]
+        valid_samples = [
+            [
+                x for x in self._samples_list[-win:] if x is not None
+            ] for win in self._windows
+        ]
+        for i in range(len(self._windows)):
+            vsamples = valid_samples[i]
+            if len(vsamples) > 0:
+                self._averages[i] = fsum(vsamples) / len(vsamples)
+                self._ranges[i] = [min(vsamples), max(vsamples)]
+            else:
+                self._averages[i] = None
+                self._ranges[i] = [None, None]
+        self._avgsamples.append(self._averages[-1])
+
+
+def samples(count):
+    rnd = random.Random(1337)
+    result = list()
+    for i in range(count):
+        if rnd.random() < 0.05:
+            result.append(None)
+        else:
+            result.append(rnd.uniform(-1e3, 1e3) * rnd.choice([1e-9, 1, 1e9]))
+    return result
+
+
+def verify(data):
+    new = RasPySampleLogger(MAXLOG, list(WINDOWS))
+    old = LegacySampleLogger(MAXLOG, list(WINDOWS))
+    for i in range(len(data)):
+        new.log(i * 60, data[i])
+        old.log(i * 60, data[i])
+        ranges = [[r.get_min(), r.get_max()] for r in new.get_ranges()]
+        if new.get_averages() != old._averages or ranges != old._ranges:
+            raise AssertionError("results differ at sample {}".format(i))
+    print("results are identical for {} samples".format(len(data)))
+
+
+def bench(cls, data):
+    def run():
+        logger = cls(MAXLOG, list(WINDOWS))
+        for i in range(len(data)):
+            logger.log(i * 60, data[i])
+    return min(timeit.repeat(run, number=1, repeat=3))
+
+
+if __name__ == "__main__":
+    data = samples(3 * MAXLOG)
+    verify(data)
+
+    told = bench(LegacySampleLogger, data)
+    tnew = bench(RasPySampleLogger, data)
+    print("legacy: {:.2f} us/sample".format(told * 1e6 / len(data)))
+    print("new:    {:.2f} us/sample".format(tnew * 1e6 / len(data)))
+    print("speedup: {:.1f}x".format(told / tnew))
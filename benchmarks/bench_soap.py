@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+# decoding the soap responses of one fritz update: parsing the
+# whole response and converting the strings by hand compared to
+# FritzboxDecoder, which stops after the fields of the action
+#
+# python benchmarks/bench_soap.py
+import os
+import sys
+import timeit
+import xml.etree.cElementTree as ET
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from arrow import factory
+from raspysystem.raspytime import RasPyTime
+from raspytasks.fritz.fritzbox import FritzboxReader, FritzboxDecoder
+
+UPDATES = 2000
+
+ENVELOPE = (
+    "<?xml version=\"1.0\"?>\n"
+    "<s:Envelope xmlns:s=\"http://schemas.xmlsoap.org/soap/envelope/\" "
+    "s:encodingStyle=\"http://schemas.xmlsoap.org/soap/encoding/\">\n"
+    "<s:Body>\n"
+    "<u:{action}Response xmlns:u=\"{type}\">\n"
+    "{fields}\n"
+    "</u:{action}Response>\n"
+    "</s:Body>\n"
+    "</s:Envelope>\n"
+)
+
+# device log of a box which is up for some days
+DEVICELOG = "\n".join(
+    "11.08.15 10:{:02d}:05 Internetverbindung wurde erfolgreich hergestellt. "
+    "IP-Adresse: 84.128.0.{}, DNS-Server: 217.237.150.51 und 217.237.148.22, "
+    "Gateway: 62.155.243.{}, Breitband-PoP: DUSX41".format(i % 60, i, i)
+    for i in range(100)
+)
+
+# responses of a fritzbox 7490, 113.07.12
+RESPONSES = [
+    ("DeviceInfo", "urn:dslforum-org:service:DeviceInfo:1", "GetInfo", (
+        "<NewManufacturerName>AVM</NewManufacturerName>\n"
+        "<NewManufacturerOUI>00040E</NewManufacturerOUI>\n"
+        "<NewModelName>FRITZ!Box 7490</NewModelName>\n"
+        "<NewDescription>FRITZ!Box 7490 113.07.12</NewDescription>\n"
+        "<NewProductClass>AVMFB</NewProductClass>\n"
+        "<NewSerialNumber>3CA62F5E1C42</NewSerialNumber>\n"
+        "<NewSoftwareVersion>113.07.12</NewSoftwareVersion>\n"
+        "<NewHardwareVersion>FRITZ!Box 7490</NewHardwareVersion>\n"
+        "<NewSpecVersion>1.0</NewSpecVersion>\n"
+        "<NewProvisioningCode></NewProvisioningCode>\n"
+        "<NewUpTime>412937</NewUpTime>\n"
+        "<NewDeviceLog>" + DEVICELOG + "</NewDeviceLog>"
+    )),
+    ("UserInterface", "urn:dslforum-org:service:UserInterface:1", "GetInfo", (
+        "<NewUpgradeAvailable>0</NewUpgradeAvailable>\n"
+        "<NewPasswordRequired>0</NewPasswordRequired>\n"
+        "<NewPasswordUserSelectable>1</NewPasswordUserSelectable>\n"
+        "<NewWarrantyDate>0001-01-01T00:00:00</NewWarrantyDate>\n"
+        "<NewX_AVM-DE_Version></NewX_AVM-DE_Version>\n"
+        "<NewX_AVM-DE_DownloadURL></NewX_AVM-DE_DownloadURL>\n"
+        "<NewX_AVM-DE_InfoURL></NewX_AVM-DE_InfoURL>\n"
+        "<NewX_AVM-DE_UpdateState>Stopped</NewX_AVM-DE_UpdateState>\n"
+        "<NewX_AVM-DE_LaborVersion></NewX_AVM-DE_LaborVersion>"
+    )),
+    ("Time", "urn:dslforum-org:service:Time:1", "GetInfo", (
+        "<NewNTPServer1>ntp.1und1.de</NewNTPServer1>\n"
+        "<NewNTPServer2></NewNTPServer2>\n"
+        "<NewCurrentLocalTime>2015-08-11T10:55:05+02:00</NewCurrentLocalTime>\n"
+        "<NewLocalTimeZone></NewLocalTimeZone>\n"
+        "<NewLocalTimeZoneName>CET-1CEST-2,M3.5.0/02:00:00,M10.5.0/03:00:00</NewLocalTimeZoneName>\n"
+        "<NewDaylightSavingsUsed>1</NewDaylightSavingsUsed>\n"
+        "<NewDaylightSavingsStart>0001-01-01T00:00:00</NewDaylightSavingsStart>\n"
+        "<NewDaylightSavingsEnd>0001-01-01T00:00:00</NewDaylightSavingsEnd>"
+    )),
+    ("WANCommonInterfaceConfig", "urn:dslforum-org:service:WANCommonInterfaceConfig:1", "GetTotalBytesReceived", (
+        "<NewTotalBytesReceived>1893442179</NewTotalBytesReceived>"
+    )),
+    ("WANCommonInterfaceConfig", "urn:dslforum-org:service:WANCommonInterfaceConfig:1", "GetTotalBytesSent", (
+        "<NewTotalBytesSent>228451042</NewTotalBytesSent>"
+    )),
+    ("WANDSLInterfaceConfig", "urn:dslforum-org:service:WANDSLInterfaceConfig:1", "GetInfo", (
+        "<NewEnable>1</NewEnable>\n"
+        "<NewStatus>Up</NewStatus>\n"
+        "<NewDataPath>Interleaved</NewDataPath>\n"
+        "<NewUpstreamCurrRate>2400</NewUpstreamCurrRate>\n"
+        "<NewDownstreamCurrRate>16000</NewDownstreamCurrRate>\n"
+        "<NewUpstreamMaxRate>2823</NewUpstreamMaxRate>\n"
+        "<NewDownstreamMaxRate>18244</NewDownstreamMaxRate>\n"
+        "<NewUpstreamNoiseMargin>110</NewUpstreamNoiseMargin>\n"
+        "<NewDownstreamNoiseMargin>90</NewDownstreamNoiseMargin>\n"
+        "<NewUpstreamAttenuation>130</NewUpstreamAttenuation>\n"
+        "<NewDownstreamAttenuation>250</NewDownstreamAttenuation>\n"
+        "<NewATURVendor>0x41564d00</NewATURVendor>\n"
+        "<NewATURCountry>0x0400</NewATURCountry>\n"
+        "<NewUpstreamPower>496</NewUpstreamPower>\n"
+        "<NewDownstreamPower>513</NewDownstreamPower>"
+    )),
+    ("Hosts", "urn:dslforum-org:service:Hosts:1", "GetSpecificHostEntry", (
+        "<NewIPAddress>192.168.178.23</NewIPAddress>\n"
+        "<NewAddressSource>DHCP</NewAddressSource>\n"
+        "<NewLeaseTimeRemaining>863702</NewLeaseTimeRemaining>\n"
+        "<NewInterfaceType>802.11</NewInterfaceType>\n"
+        "<NewActive>1</NewActive>\n"
+        "<NewHostName>android-4f2a</NewHostName>"
+    ))
+]
+
+# what the callers did with the strings
+CONVERSIONS = {
+    "NewUpTime": int,
+    "NewUpgradeAvailable": lambda text: int(text) == 1,
+    "NewTotalBytesReceived": int,
+    "NewTotalBytesSent": int,
+    "NewUpstreamCurrRate": int,
+    "NewUpstreamMaxRate": int,
+    "NewDownstreamCurrRate": int,
+    "NewDownstreamMaxRate": int,
+    "NewLeaseTimeRemaining": int,
+    "NewActive": lambda text: int(text) == 1
+}
+
+
+def recorded():
+    for name, stype, action, fields in RESPONSES:
+        content = ENVELOPE.format(type=stype, action=action, fields=fields)
+        yield name, stype, action, content
+
+
+def legacy(tf, calls):
+    def decode():
+        for stype, action, content in calls:
+            root = ET.fromstring(content)
+            search_string = ".//{{{}}}{}Response".format(stype, action)
+            response = root.find(search_string)
+            items = dict()
+            for child in response:
+                items[child.tag] = child.text
+            for field, conv in CONVERSIONS.iteritems():
+                if field in items:
+                    conv(items[field])
+            if "NewCurrentLocalTime" in items:
+                tf.get(items["NewCurrentLocalTime"]).timestamp
+    return decode
+
+
+def decoders(calls):
+    def decode():
+        for decoder, content in calls:
+            decoder.decode(content)
+    return decode
+
+
+def bench(func):
+    def run():
+        for _ in range(UPDATES):
+            func()
+    return min(timeit.repeat(run, number=1, repeat=3))
+
+
+if __name__ == "__main__":
+    tf = factory.ArrowFactory(RasPyTime)
+    responses = list(recorded())
+
+    told = bench(legacy(tf, [
+        (stype, action, content)
+        for name, stype, action, content in responses
+    ]))
+    tnew = bench(decoders([
+        (FritzboxDecoder(stype, action, FritzboxReader.FIELDS.get((name, action))), content)
+        for name, stype, action, content in responses
+    ]))
+    print("{} responses, {} bytes".format(
+        len(responses), sum(len(r[3]) for r in responses)
+    ))
+    print("fromstring: {:.1f} us/update".format(told * 1e6 / UPDATES))
+    print("decoder: {:.1f} us/update".format(tnew * 1e6 / UPDATES))
+    print("speedup: {:.1f}x".format(told / tnew))
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# cost of one scheduler tick: creating the time of the update
+# and the calls tasks and energy meters make on it.
+# arrow based RasPyTime compared to RasPyTick
+#
+# python benchmarks/bench_time.py
+import os
+import sys
+import time
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from arrow import factory
+from raspysystem.raspytime import RasPyTime, RasPyTick
+
+TICKS = 2000
+# a task passes time to these many loggers, meters etc
+USERS = 10
+
+
+def use(tick):
+    tick.every_quarter()
+    tick.new_hour()
+    tick.new_day()
+    tick.new_week()
+    tick.new_month()
+    tick.ge("06:00")
+    tick.lt("18:00")
+    for _ in range(USERS):
+        tick.jstimestamp()
+
+
+def legacy_tick(tf, timestamp):
+    tick = tf.get(timestamp).to("local").norm()
+    use(tick)
+    # energy meter estimations
+    for frame in ["hour", "day", "week", "month"]:
+        (tick.ceil(frame).norm() - tick).total_seconds()
+    # kernel.get_time() copies for every task
+    for _ in range(USERS):
+        tf.get(tick)
+
+
+def new_tick(timestamp):
+    tick = RasPyTick(timestamp)
+    use(tick)
+    for frame in ["hour", "day", "week", "month"]:
+        tick.get_endof(frame) - tick.timestamp
+
+
+def bench(func):
+    start = int(time.time()) // 60 * 60
+    def run():
+        for i in range(TICKS):
+            func(start + i * 60)
+    return min(timeit.repeat(run, number=1, repeat=3))
+
+
+if __name__ == "__main__":
+    tf = factory.ArrowFactory(RasPyTime)
+    told = bench(lambda timestamp: legacy_tick(tf, timestamp))
+    tnew = bench(new_tick)
+    print("RasPyTime: {:.1f} us/tick".format(told * 1e6 / TICKS))
+    print("RasPyTick: {:.1f} us/tick".format(tnew * 1e6 / TICKS))
+    print("speedup: {:.1f}x".format(told / tnew))
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+# bytes per full RasPySampleLogger (maxlog=1440)
+# compared to the previous deque based storage
+#
+# python benchmarks/mem_samplelogger.py
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_samplelogger import LegacySampleLogger, samples, MAXLOG, WINDOWS
+from raspysystem.raspysamplelogger import RasPySampleLogger
+
+
+def deep_size(container):
+    seen = set()
+    size = sys.getsizeof(container)
+    for item in container:
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+    return size
+
+
+def legacy_memory(logger):
+    return (
+        deep_size(logger._samples) +
+        sys.getsizeof(logger._samples_list) +
+        deep_size(logger._avgsamples) +
+        deep_size(logger._timestamps)
+    )
+
+
+def new_memory(logger):
+    return (
+        logger.get_memory() +
+        sys.getsizeof(logger._samples._data) - logger._samples.get_memory() +
+        sys.getsizeof(logger._avgsamples._data) - logger._avgsamples.get_memory()
+    )
+
+
+def report(name, data):
+    old = LegacySampleLogger(MAXLOG, list(WINDOWS))
+    new = RasPySampleLogger(MAXLOG, list(WINDOWS))
+    for i in range(len(data)):
+        old.log(1500000000 + i * 60, data[i])
+        new.log(1500000000 + i * 60, data[i])
+
+    bold = legacy_memory(old)
+    bnew = new_memory(new)
+    print("{:8s} legacy: {:7d} bytes  new: {:7d} bytes  ({:.1f}x)".format(
+        name, bold, bnew, float(bold) / bnew
+    ))
+
+
+if __name__ == "__main__":
+    report("float", samples(MAXLOG))
+    report("int", [i % 2 for i in range(MAXLOG)])
@@ -4,6 +4,12 @@ class RasPy  {
 	const RASPY_ADDRESS = 'localhost';
 	const RASPY_PORT = 1337;
 	const RESPONSE_LENGTH = 256;
+    // framed protocol, see raspyserver.py
+    const PROTOCOL_MAGIC = 'RPY';
+    const PROTOCOL_VERSION = 1;
+    const FRAME_HEADER_LEN = 4;
+    // in seconds, connect and read
+    const SOCKET_TIMEOUT = 5;
 
     const STATUS_LEN = 3;
     // from pikernel.py
@@ -115,37 +121,119 @@ class RasPy  {
         return true;
     }
 
-	private function send_request($request, &$response) {
-		$so = @socket_create(AF_INET, SOCK_STREAM, SOL_TCP);
-
-		if($so === false) {
-				$response = $this::ERR_SOCKET;
+    private function socket_read_exact($so, $length) {
+        $data = '';
+        while(strlen($data) < $length) {
+            $buf = @fread($so, min($length - strlen($data), 65536));
+            if( $buf === false || strlen($buf) == 0 ) {
                 return false;
-		} else {
-			if (@socket_connect($so, $this::RASPY_ADDRESS, $this::RASPY_PORT) === false) {
+            }
+            $data .= $buf;
+        }
+        return $data;
+    }
+
+    // persistent connection of this php process, see pfsockopen.
+    // it is kept by following requests until raspy closes it
+    // after idling, $reused tells if the handshake was sent
+    private function socket_connect_raspy(&$reused) {
+        $errno = 0;
+        $errstr = '';
+        // prefer unix domain socket if configured
+        if( isset($this->config['server']['unix']) ) {
+            $so = @pfsockopen(
+                'unix://' . $this->config['server']['unix'], -1,
+                $errno, $errstr, $this::SOCKET_TIMEOUT
+            );
+        } else {
+            $so = @pfsockopen(
+                $this::RASPY_ADDRESS, $this::RASPY_PORT,
+                $errno, $errstr, $this::SOCKET_TIMEOUT
+            );
+        }
+        if( $so === false ) {
+            return NULL;
+        }
+        stream_set_timeout($so, $this::SOCKET_TIMEOUT);
+
+        // bytes were written by an earlier request
+        $reused = ftell($so) > 0;
+        // raspy never sends unasked: readable means closed
+        // or left over of an aborted request, start over
+        if( $reused ) {
+            $read = array($so);
+            $write = NULL;
+            $except = NULL;
+            if( @stream_select($read, $write, $except, 0) !== 0 ) {
+                fclose($so);
+                return $this->socket_connect_raspy($reused);
+            }
+        }
+        return $so;
+    }
+
+    // returns the response or false
+    // $sent tells if the whole query was written,
+    // raspy drops incomplete frames
+    private function socket_query($so, $reused, $request, &$sent) {
+        $sent = false;
+        $frame = '';
+        if( !$reused ) {
+            $frame .= $this::PROTOCOL_MAGIC . chr($this::PROTOCOL_VERSION);
+        }
+        $frame .= pack('N', strlen($request)) . $request;
+        if( @fwrite($so, $frame) !== strlen($frame) ) {
+            return false;
+        }
+        $sent = true;
+
+        $header = $this->socket_read_exact($so, $this::FRAME_HEADER_LEN);
+        if( $header === false ) {
+            return false;
+        }
+        $length = unpack('N', $header);
+        return $this->socket_read_exact($so, $length[1]);
+    }
+
+    // $retry: query may run twice, only for queries which
+    // do not change anything, eg REPORT
+	private function send_request($request, &$response, $retry = false) {
+        $reused = false;
+		$so = $this->socket_connect_raspy($reused);
+
+		if($so === NULL) {
                 $response = $this::ERR_NOT_RUNNING;
 				return false;
-			} else {
-				socket_write($so, $request, strlen($request));
-
-				$response = '';
-				while(true) {
-					$buf = socket_read($so, $this::RESPONSE_LENGTH);
-					if( strlen($buf) == 0 )
-						break;
-					$response .= $buf;
-				}
-				socket_close($so);
-
-                // strip kernel status
-                $status = substr($response, 0, $this::STATUS_LEN);
-                if( $status == $this::ERR_NONE ) {
-                    $response = substr($response, $this::STATUS_LEN);
-                    return true;
-                }
-                return false;
-			}
 		}
+
+        $sent = false;
+        $response = $this->socket_query($so, $reused, $request, $sent);
+        // closed by raspy meanwhile, once more on a new connection
+        // if raspy may not have run it yet
+        if( $response === false && $reused && ($retry || !$sent) ) {
+            fclose($so);
+            $so = $this->socket_connect_raspy($reused);
+            if( $so === NULL ) {
+                $response = $this::ERR_NOT_RUNNING;
+                return false;
+            }
+            $response = $this->socket_query($so, $reused, $request, $sent);
+        }
+
+        if( $response === false ) {
+            // framing is lost, do not reuse
+            fclose($so);
+            $response = $this::ERR_SOCKET;
+            return false;
+        }
+
+        // strip kernel status
+        $status = substr($response, 0, $this::STATUS_LEN);
+        if( $status == $this::ERR_NONE ) {
+            $response = substr($response, $this::STATUS_LEN);
+            return true;
+        }
+        return false;
 	}
 
     private function reduce_samplelogger(&$logger) {
@@ -361,7 +449,7 @@ class RasPy  {
         $request .= '}';
 
         $response = '';
-        $success = $this->send_request($request, $response);
+        $success = $this->send_request($request, $response, true);
         if( $success ) {
             $response = $this->postprocess_payload($response);
         }
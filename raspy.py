@@ -10,16 +10,6 @@ if __name__ == "__main__":
 
     # kernel
     from raspysystem.raspykernel import RasPyKernel
-    # tasks
-    from raspytasks.supply.task import SupplyTask
-    from raspytasks.system.task import SystemTask
-    from raspytasks.weather.task import WeatherTask
-    from raspytasks.fritz.task import FritzTask
-    from raspytasks.sensor.task import SensorTask
-    from raspytasks.rcsocket.task import RCSocketTask
-    from raspytasks.notifier.task import NotifierTask
-    from raspytasks.traffic.task import TrafficTask
-    # from raspytasks.stats.task import StatsTask
 
     parser = argparse.ArgumentParser(
         description="Smart periodic task execution application for the Raspberry Pi"
@@ -30,16 +20,19 @@ if __name__ == "__main__":
 
     raspy = RasPyKernel(path, cfg.debug)
 
-    # spawn tasks
-    FritzTask(raspy)
-    SystemTask(raspy)
-    SupplyTask(raspy)
-    RCSocketTask(raspy)
-    TrafficTask(raspy)
-    WeatherTask(raspy)
-    SensorTask(raspy)
-    NotifierTask(raspy)
-    # StatsTask(raspy)
+    # tasks are imported on startup,
+    # only if enabled in config: tasks
+    raspy.register_tasks([
+        ["fritz", "raspytasks.fritz.task", "FritzTask"],
+        ["system", "raspytasks.system.task", "SystemTask"],
+        ["supply", "raspytasks.supply.task", "SupplyTask"],
+        ["rcsocket", "raspytasks.rcsocket.task", "RCSocketTask"],
+        ["traffic", "raspytasks.traffic.task", "TrafficTask"],
+        ["weather", "raspytasks.weather.task", "WeatherTask"],
+        ["sensor", "raspytasks.sensor.task", "SensorTask"],
+        ["notifier", "raspytasks.notifier.task", "NotifierTask"],
+        # ["statistics", "raspytasks.stats.task", "StatsTask"]
+    ])
 
     raspy.run()
     raise Exception("self shutdown. see info log!")
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import time
+import ctypes
+import ctypes.util
+
+
+class RasPyTimespec(ctypes.Structure):
+    _fields_ = [
+        ("tv_sec", ctypes.c_long),
+        ("tv_nsec", ctypes.c_long)
+    ]
+
+# monotonic clock in seconds, not affected by
+# changes of the system time (ntp, manual)
+# falls back to time.time() without clock_gettime
+class RasPyClock(object):
+    CLOCK_MONOTONIC = 1
+
+    def __init__(self):
+        self._clock_gettime = None
+        try:
+            librt = ctypes.CDLL(
+                ctypes.util.find_library("rt") or "librt.so.1",
+                use_errno=True
+            )
+            self._clock_gettime = librt.clock_gettime
+            self._clock_gettime.argtypes = [
+                ctypes.c_int,
+                ctypes.POINTER(RasPyTimespec)
+            ]
+        except (OSError, AttributeError):
+            pass
+
+    def is_monotonic(self):
+        return self._clock_gettime is not None
+
+    def monotonic(self):
+        if self._clock_gettime is None:
+            return time.time()
+        ts = RasPyTimespec()
+        if self._clock_gettime(self.CLOCK_MONOTONIC, ctypes.byref(ts)) != 0:
+            return time.time()
+        return ts.tv_sec + ts.tv_nsec * 1e-9
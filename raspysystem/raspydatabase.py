@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+import threading
+import time
+
+# sqlite database shared by all threads.
+# sqlite connections must not be shared between threads,
+# so every thread gets its own connection, which is opened
+# on first use and kept open until close()
+class RasPyDatabase(object):
+    # prepared statements per connection
+    CACHED_STATEMENTS = 64
+
+    # wal: readers don't block the writer and commits
+    # only append to the log instead of syncing the database
+    def __init__(self, path, wal=False):
+        self._path = path
+        self._wal = wal
+        self._local = threading.local()
+        self._connections = list()
+        self._lock = threading.Lock()
+
+        # writes for the next flush()
+        self._deferred = list()
+        self._flushes = 0
+        self._flushtime = 0.0
+
+    def get_path(self):
+        return self._path
+
+    def is_wal(self):
+        return self._wal
+
+    # of the calling thread
+    def connection(self):
+        conn = getattr(self._local, "connection", None)
+        if conn is None:
+            # only used by its thread, but closed by close()
+            conn = sqlite3.connect(
+                self._path,
+                check_same_thread=False,
+                cached_statements=self.CACHED_STATEMENTS
+            )
+            conn.row_factory = sqlite3.Row
+            if self._wal:
+                conn.execute("PRAGMA journal_mode=WAL")
+                # wal is consistent without syncing every commit
+                conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def cursor(self):
+        return self.connection().cursor()
+
+    def commit(self):
+        self.connection().commit()
+
+    def rollback(self):
+        self.connection().rollback()
+
+    # func(cursor, *args) is called by the next flush()
+    def defer(self, func, *args):
+        with self._lock:
+            self._deferred.append((func, args))
+
+    def pending(self):
+        with self._lock:
+            return len(self._deferred)
+
+    # all deferred writes in a single transaction
+    # returns the number of writes
+    def flush(self):
+        with self._lock:
+            deferred = self._deferred
+            self._deferred = list()
+
+        if not deferred:
+            return 0
+
+        start = time.time()
+        conn = self.connection()
+        db = conn.cursor()
+        try:
+            for func, args in deferred:
+                func(db, *args)
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        finally:
+            self._flushes += 1
+            self._flushtime = time.time() - start
+
+        return len(deferred)
+
+    def get_flushtime(self):
+        return self._flushtime
+
+    def serialize(self):
+        with self._lock:
+            return dict(
+                wal=self._wal,
+                connections=len(self._connections),
+                pending=len(self._deferred),
+                flushes=self._flushes,
+                flushtime=self._flushtime
+            )
+
+    # no thread may use the database anymore
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            del self._connections[:]
+        self._local = threading.local()
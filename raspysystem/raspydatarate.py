@@ -6,9 +6,14 @@ class RasPyByteRate(object):
 
         self._period = period
         self._bytes_last = None
+        self._time_last = None
         self._ratelog = RasPySampleLogger(maxlog, windows)
 
-    def calc(self, newbytes):
+    def get_log(self):
+        return self._ratelog
+
+    # elapsed: seconds since last bytes, default period
+    def calc(self, newbytes, elapsed=None):
         # garbage measurment
         if newbytes is None:
             rate = None
@@ -20,15 +25,36 @@ class RasPyByteRate(object):
             rate = None
         else:
             # get byte/s
-            rate = float(newbytes - self._bytes_last) / self._period
+            rate = float(newbytes - self._bytes_last) / (
+                elapsed or self._period
+            )
 
         self._bytes_last = newbytes
         return rate
 
     def log(self, timestamp, newbytes):
-        rate = self.calc(newbytes)
+        # skipped updates or a restart
+        elapsed = None
+        if self._time_last is not None and timestamp > self._time_last:
+            elapsed = timestamp - self._time_last
+        rate = self.calc(newbytes, elapsed)
+        self._time_last = timestamp
         self._ratelog.log(timestamp, rate)
 
+    # the baseline survives a restart, so the first rate
+    # afterwards is the average over the downtime
+    def snapshot(self):
+        return dict(
+            bytes=self._bytes_last,
+            time=self._time_last,
+            log=self._ratelog.snapshot()
+        )
+
+    def restore(self, state, timestamp):
+        self._ratelog.restore(state["log"], timestamp, self._period)
+        self._bytes_last = state["bytes"]
+        self._time_last = state["time"]
+
     def serialize(self):
         return dict(
             total_bytes=self._bytes_last,
@@ -37,8 +63,8 @@ class RasPyByteRate(object):
 
 class RasPyBitRate(RasPyByteRate):
 
-    def calc(self, newbytes):
-        rate = RasPyByteRate.calc(self, newbytes)
+    def calc(self, newbytes, elapsed=None):
+        rate = RasPyByteRate.calc(self, newbytes, elapsed)
         # get bits/s
         if rate is not None:
             rate *= 8.0
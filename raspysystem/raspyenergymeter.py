@@ -1,20 +1,32 @@
 # -*- coding: utf-8 -*-
-import sqlite3
-import os
 import arrow
 from raspysamplelogger import RasPySampleLogger
 
 class RasPyEnergyMeter(object):
+    # shared by all meters of the same period, see kernel.get_database()
+    DBFILE = "energy{}.sqlite"
 
-    def __init__(self, period, path, prefix):
+    def __init__(self, period, database, prefix):
 
-        self._dbfile = os.path.join(
-            path,
-            "energy{}.sqlite".format(period)
-        )
+        self._database = database
         self._dbprefix = prefix
         self._update_period = period
 
+        # same strings for the statement cache
+        # tstart is the rowid of the single total row
+        self._sql_store_total = (
+            "UPDATE '{}_total' SET {}, {}, {} WHERE tstart = ?".format(
+                prefix,
+                "'wh'=?",
+                "'ton'=?",
+                "'toff'=?"
+            )
+        )
+        self._sql_store_month = (
+            "INSERT INTO '{}_month' ('wh') VALUES (?)".format(prefix)
+        )
+        self._sql_clear_month = "DELETE FROM '{}_month'".format(prefix)
+
         self._wh_per_update = 0
         self._hour_cnt = 0
         self._day_cnt = 0
@@ -38,55 +50,44 @@ class RasPyEnergyMeter(object):
         # timestamp
         self._tstart = None
 
-    def _db_store_total(self, db):
-        db.execute(
-            "UPDATE '{}_total' SET {}, {}, {} WHERE rowid = 1".format(
-                self._dbprefix,
-                "'wh'=?",
-                "'ton'=?",
-                "'toff'=?"
-            ),
-            (
-                self._total_cnt,
-                self._ton,
-                self._toff
-            )
-        )
+    # wh of every hour
+    def get_hour_log(self):
+        return self._day_wh_log
 
-    def _db_store_month(self, db):
-        db.execute(
-            "INSERT INTO '{}_month' ('wh') VALUES (?)".format(
-                self._dbprefix
-            ),
-            (
-                self._day_cnt,
-            )
-        )
+    # wh of every day
+    def get_day_log(self):
+        return self._month_wh_log
 
-    def _db_clear_month(self, db):
-        db.execute(
-            "DELETE FROM '{}_month'".format(
-                self._dbprefix
-            )
-        )
+    def _db_store_total(self, db, total, ton, toff):
+        db.execute(self._sql_store_total, (total, ton, toff, self._tstart))
 
-    def _store_state(self, time):
-        conn = sqlite3.connect(self._dbfile)
-        db = conn.cursor()
+    def _db_store_month(self, db, wh):
+        db.execute(self._sql_store_month, (wh,))
+
+    def _db_clear_month(self, db):
+        db.execute(self._sql_clear_month)
 
-        self._db_store_total(db)
-        self._db_store_month(db)
+    # called by database flush
+    def _db_store_state(self, db, total, ton, toff, wh, new_month):
+        self._db_store_total(db, total, ton, toff)
+        self._db_store_month(db, wh)
 
-        if time.new_month():
+        if new_month:
             self._db_clear_month(db)
 
-        conn.commit()
-        conn.close()
+    # written with all other meters by the next flush
+    def _store_state(self, time):
+        self._database.defer(
+            self._db_store_state,
+            self._total_cnt,
+            self._ton,
+            self._toff,
+            self._day_cnt,
+            time.new_month()
+        )
 
     def _sync_to_database(self, time):
-        conn = sqlite3.connect(self._dbfile)
-        conn.row_factory = sqlite3.Row
-        db = conn.cursor()
+        db = self._database.cursor()
 
         # create tables if not exist
         db.execute(
@@ -173,7 +174,7 @@ class RasPyEnergyMeter(object):
                 self._toff += 24 * 60 * 60 / self._update_period
                 # at this point self._day_cnt is 0
                 # store this to database
-                self._db_store_month(db)
+                self._db_store_month(db, self._day_cnt)
 
             whs.extend(missing_whs)
 
@@ -197,12 +198,12 @@ class RasPyEnergyMeter(object):
             self._week_cnt += wh
             self._week_wh_log.log(ts.jstimestamp(), wh)
 
-        conn.commit()
-        conn.close()
+        self._database.commit()
 
-    def _approx_consum(self, atime, btime):
-        dt = btime - atime
-        return self._wh_per_update * dt.total_seconds() / self._update_period
+    # until end of frame, see RasPyTick.get_endof
+    def _approx_consum(self, time, frame):
+        dt = time.get_endof(frame) - time.timestamp
+        return self._wh_per_update * dt / self._update_period
 
     def update(self, time, power):
 
@@ -261,15 +262,10 @@ class RasPyEnergyMeter(object):
 
 
         # calc estimations
-        end_of_hour = time.ceil('hour').norm()
-        end_of_day = time.ceil('day').norm()
-        end_of_week = time.ceil('week').norm()
-        end_of_month = time.ceil('month').norm()
-
-        self._endof_hour = self._hour_cnt + self._approx_consum(time, end_of_hour)
-        self._endof_day = self._day_cnt + self._approx_consum(time, end_of_day)
-        self._endof_week = self._week_cnt + self._approx_consum(time, end_of_week)
-        self._endof_month = self._month_cnt + self._approx_consum(time, end_of_month)
+        self._endof_hour = self._hour_cnt + self._approx_consum(time, "hour")
+        self._endof_day = self._day_cnt + self._approx_consum(time, "day")
+        self._endof_week = self._week_cnt + self._approx_consum(time, "week")
+        self._endof_month = self._month_cnt + self._approx_consum(time, "month")
 
     def serialize(self):
         return dict(
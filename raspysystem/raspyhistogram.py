@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+import threading
+from bisect import bisect_left
+
+# counts values into buckets
+# bucket i holds values <= bounds[i]
+# last bucket holds everything above
+class RasPyHistogram(object):
+
+    def __init__(self, bounds):
+        self._bounds = bounds
+        self._counts = [0 for _ in range(len(bounds) + 1)]
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def get_count(self):
+        return self._count
+
+    def add(self, value):
+        index = bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum += value
+            if value > self._max:
+                self._max = value
+
+    def clear(self):
+        with self._lock:
+            for i in range(len(self._counts)):
+                self._counts[i] = 0
+            self._count = 0
+            self._sum = 0.0
+            self._max = 0.0
+
+    # consistent while other threads add values
+    def serialize(self):
+        with self._lock:
+            return dict(
+                bounds=self._bounds,
+                counts=list(self._counts),
+                count=self._count,
+                average=None if self._count == 0 else (
+                    self._sum / self._count
+                ),
+                max=self._max
+            )
@@ -1,23 +1,34 @@
 # -*- coding: utf-8 -*-
 import os
+import importlib
 import argparse
 import threading
 import socket
+import sqlite3
+import time
 import logging
 import logging.handlers
 import wiringpi2
 import Queue
-import sqlite3
+import zlib
+import cPickle
+from collections import deque
 import simplejson as json
 from arrow import factory
-from time import sleep
 from HTMLParser import HTMLParser
 
 from raspytask import RasPySimpleTask, RasPyTask
-from raspytime import RasPyTime
+from raspytime import RasPyTime, RasPyTick
 from raspylogger import RasPyLogger
 from raspysupplyreader import RasPySupplyReader
 from raspysamplelogger import RasPySampleLogger
+from raspyserver import RasPyServer
+from raspythreadpool import RasPyThreadPool
+from raspyhistogram import RasPyHistogram
+from raspypatch import RasPyTreeDiff
+from raspyclock import RasPyClock
+from raspydatabase import RasPyDatabase
+from raspytimeseries import RasPyTimeSeriesStore, DECIMATORS
 
 # PHP Frontend will add wrapper:
 # prepend result string with error code
@@ -26,24 +37,24 @@ from raspysamplelogger import RasPySampleLogger
 #     payload: { see ^ }|"error message string"
 # }
 
-# class RasPyPingPongCache(object):
-#     def __init__(self):
-#         self._active = 0
-#         self._active_lock = threading.Lock()
-#         self.buffers = [None, None]
-
-#     def store(self, tsdata):
-#         self.buffers[self._active] = tsdata
-
-#         self._active_lock.acquire(True)
-#         self._active ^= 1
-#         self._active_lock.release()
-
-#     def recall(self):
-#         self._active_lock.acquire(True)
-#         buf = self.buffers[self._active^1]
-#         self._active_lock.release()
-#         return buf
+# double buffered cache
+# the writer fills the inactive buffer and publishes it
+# by flipping the index, which is a single assignment.
+# readers never block and always get the last published data.
+# >only one writer at a time: writers hold the scheduler lock
+class RasPyPingPongCache(object):
+    def __init__(self):
+        self._active = 0
+        self._buffers = [None, None]
+
+    def store(self, tsdata):
+        inactive = self._active ^ 1
+        self._buffers[inactive] = tsdata
+        self._active = inactive
+
+    # None until first store
+    def recall(self):
+        return self._buffers[self._active]
 
 class RasPyKernel(RasPyLogger):
     VERSION_MAJOR = "3"
@@ -54,6 +65,7 @@ class RasPyKernel(RasPyLogger):
     LOGFILE = "info.log"
     CFGFILE = "config.json"
     SQLFILE = "master.sqlite"
+    SNAPSHOTFILE = "snapshot.bin"
 
     ERR_NONE = "E00"
     ERR_NOTRUNYET = "E01"
@@ -63,11 +75,35 @@ class RasPyKernel(RasPyLogger):
 
     QRY_REQUEST = "REQUEST"
     QRY_REPORT = "REPORT"
+    QRY_REPORTS = "REPORTS"
+    QRY_HISTORY = "HISTORY"
     QRY_PING = "PING"
     QRY_EXIT = "EXIT"
 
     SERVER_HOST = "localhost"
     SERVER_PORT = 1337
+    # concurrent queries, see config: server.workers
+    SERVER_WORKERS = 4
+    # in seconds, max runtime of a task, see config: scheduler.timeout
+    # >both phases have to fit into UPDATE_PERIOD_WARN
+    TASK_TIMEOUT = 20
+    # in seconds, max warmup time of a task, see config: scheduler.warmup
+    WARMUP_TIMEOUT = 120
+    # lock wait histogram bounds, in ms
+    LOCKWAIT_BOUNDS = [0.1, 1, 10, 100, 1000]
+    # max updates a delta report can bridge
+    DELTA_MAXGAP = 15
+    # in seconds, history is synced to disk this often
+    HISTORY_SYNC = 600
+    # max records a history query reads, the newest are kept,
+    # also picks the tier of decimated queries
+    HISTORY_MAXREAD = 7 * 24 * 60
+    # in seconds, task state is written this often
+    SNAPSHOT_PERIOD = 15 * 60
+    # in seconds, older snapshots are not restored
+    SNAPSHOT_MAXAGE = 24 * 60 * 60
+    # change if the snapshot layout changes
+    SNAPSHOT_VERSION = 1
 
 
     # *MUST BE >= 60
@@ -78,11 +114,12 @@ class RasPyKernel(RasPyLogger):
     # + 5 min 300 s   @ 12 updates
     # + 15 min 900 s  @ 4 updates
     UPDATE_PERIOD = 60
-    # tickrate for scheduler
+    # supply sample rate, in seconds
     TICK_RATE = 1
     WATCHDOG_BUFFER = 10
     UPDATE_PERIOD_WTDG = UPDATE_PERIOD+WATCHDOG_BUFFER
     UPDATE_PERIOD_WARN = UPDATE_PERIOD-WATCHDOG_BUFFER
+    # in seconds, later updates are skipped
     MAX_SCHEDULE_DEVIATION = 5
 
     def __init__(self, path, debug):
@@ -93,23 +130,78 @@ class RasPyKernel(RasPyLogger):
         self._configpath = os.path.join(self._path, self.CFGFILE)
         self._logpath = os.path.join(self._path, self.LOGFILE)
         self._databasepath = os.path.join(self._path, "database")
+        self._database = RasPyDatabase(
+            os.path.join(self._databasepath, self.SQLFILE)
+        )
+        # shared task databases by filename, see get_database()
+        self._databases = dict()
+        self._databases_lock = threading.Lock()
+        # of the last flush of deferred writes
+        self._flushtime = 0.0
+        # logger history, see register_logger()
+        self._history = RasPyTimeSeriesStore(
+            os.path.join(self._databasepath, "history")
+        )
+        self._history_synced = None
+        # in-memory state of tasks, survives restarts
+        self._snapshotpath = os.path.join(
+            self._databasepath,
+            self.SNAPSHOTFILE
+        )
+        # last state by task, kept for busy tasks
+        self._snapshotstates = dict()
+        self._snapshottime = 0.0
+        self._snapshotsize = 0
         self._resourcespath = os.path.join(self._path, "resources")
 
         self._running = True
+        self._server = None
+        # runs independent tasks in parallel
+        self._taskpool = None
+        self._tasktimeout = self.TASK_TIMEOUT
+        self._warmuptimeout = self.WARMUP_TIMEOUT
+        # names of tasks still running in the pool
+        self._busytasks = set()
+        self._busytasks_lock = threading.Lock()
+        # names of tasks which overran their timeout
+        # and have not finished a run in time since
+        self._staletasks = set()
+        # number of timeouts by task name
+        self._overruns = dict()
+        # optional unix domain socket, see config: server.unix
+        self._server_unixpath = None
 
         # scheduler specific
         self._scheduler_quit = threading.Event()
         self._scheduler_lock = threading.Lock()
 
+        # [task name, module, class name]
+        # see register_tasks()
+        self._registry = list()
+        # in seconds by task name
+        self._importtimes = dict()
+        self._startuptimes = dict()
+        self._warmuptimes = dict()
+
         # shared, need scheduler_lock
         # tasks instances by task name
         self._tasks = dict()
         # tasks instances by priority
         self._taskschedule = list()
         # task response by task name
+        # >readable without lock
         self._caches = dict()
         # task response parts by task name
         self._cacheparts = dict()
+        # last report tree by task name
+        self._reports = dict()
+        # [base timestamp, json ops] by task name
+        self._patches = dict()
+        # last serialized task version by task name
+        self._versions = dict()
+        # unchanged reports, which were not serialized
+        self._skipped = dict()
+        self._treediff = RasPyTreeDiff()
 
         self._supply = RasPySupplyReader()
         self._timefactory = factory.ArrowFactory(RasPyTime)
@@ -117,16 +209,32 @@ class RasPyKernel(RasPyLogger):
         self._current_update = None
         self._updates = 0
         self._runtime = 0
+        self._clock = RasPyClock()
+        # seconds the last update started after its time
+        self._deviation = 0.0
+        # skipped updates
+        self._late = 0
         self._instance_id = None
         # log totaltime over day
         self._totaltime = RasPySampleLogger(
             self.get_updates24h(),
             [5, 15, 60]
         )
+        self.register_logger("kernel.totaltime", self._totaltime)
         self._watchdog = None
         # in seconds
         self._timeout = 5
         self._float_decimals = 4
+        # time queries waited for the scheduler lock
+        self._lockwait = dict()
+        for query_type in [
+            self.QRY_REPORT,
+            self.QRY_REPORTS,
+            self.QRY_REQUEST
+        ]:
+            self._lockwait[query_type] = RasPyHistogram(
+                self.LOCKWAIT_BOUNDS
+            )
 
     # ++PICONTROL PROPERTIES BEGIN
     def get_supply(self):
@@ -138,6 +246,26 @@ class RasPyKernel(RasPyLogger):
     def get_databasepath(self):
         return self._databasepath
 
+    # logger writes its samples through to series name
+    # which can be queried by HISTORY
+    def register_logger(self, name, logger):
+        logger.set_series(self._history.series(name))
+        self.logd("Registered history: {}".format(name))
+
+    # shared (wal) database in the database path
+    # writes should be deferred, the kernel flushes
+    # them after all tasks have run
+    def get_database(self, filename):
+        with self._databases_lock:
+            database = self._databases.get(filename)
+            if database is None:
+                database = RasPyDatabase(
+                    os.path.join(self._databasepath, filename),
+                    wal=True
+                )
+                self._databases[filename] = database
+            return database
+
     def get_resourcespath(self):
         return self._resourcespath
 
@@ -147,6 +275,10 @@ class RasPyKernel(RasPyLogger):
     def get_timefactory(self):
         return self._timefactory
 
+    # monotonic time for durations
+    def get_clock(self):
+        return self._clock
+
     def get_period(self):
         return self.UPDATE_PERIOD
 
@@ -159,11 +291,12 @@ class RasPyKernel(RasPyLogger):
     def get_updates6h(self):
         return self.get_updates24h() / 4
 
-    # returns copy
+    # RasPyTick is immutable, no copy needed
     def get_time(self):
-        return self._timefactory.get(
-            self._current_update
-        )
+        # before the scheduler runs, eg on startup
+        if self._current_update is None:
+            return RasPyTick(time.time())
+        return self._current_update
     # ++PICONTROL PROPERTIES END
 
     def serialize(self, data):
@@ -178,18 +311,65 @@ class RasPyKernel(RasPyLogger):
     def find_task(self, name):
         return self._tasks.get(name, None)
 
+    # tasks are only imported and created on startup
+    # if config "tasks" lists them, default: all
+    def register_tasks(self, tasks):
+        for name, module, classname in tasks:
+            self._registry.append([name, module, classname])
+
+    def _registered_tasks(self):
+        return [name for name, _, _ in self._registry]
+
+    def _load_tasks(self, config):
+        registered = self._registered_tasks()
+        enabled = config.get("tasks", registered)
+
+        for name in enabled:
+            if name not in registered:
+                self.loge("Unknown task in config: {}".format(name))
+                return False
+
+        for name, module, classname in self._registry:
+            if name not in enabled:
+                self.logd("Disabled: {}".format(name))
+                continue
+
+            start = self._clock.monotonic()
+            try:
+                taskclass = getattr(
+                    importlib.import_module(module),
+                    classname
+                )
+            except (ImportError, AttributeError) as e:
+                self.loge("Failed to import {}: {}".format(name, e))
+                return False
+            self._importtimes[name] = self._clock.monotonic() - start
+
+            taskclass(self)
+            if name not in self._tasks:
+                self.loge("Task has another name: {}".format(name))
+                return False
+        return True
+
     def add_task(self, task):
         if task is None:
             return
         name = task.get_name()
         # add task and create cache
         self._tasks[name] = task
-        self._caches[name] = str() # RasPyPingPongCache()
+        self._caches[name] = RasPyPingPongCache()
+        # report stays null while the first run is busy
         self._cacheparts[name] = dict(
             info=str(),
-            report=str(),
-            request=str()
+            report="null",
+            request=str(),
+            patch=None
         )
+        self._reports[name] = None
+        self._patches[name] = deque(maxlen=self.DELTA_MAXGAP)
+        self._versions[name] = None
+        self._skipped[name] = 0
+        self._overruns[name] = 0
         self._taskschedule.append(task)
         self.logd("Added task: {}".format(name))
 
@@ -202,18 +382,94 @@ class RasPyKernel(RasPyLogger):
                 totaltime=self._totaltime.serialize(),
                 runtime=self._runtime,
                 tasktime=task.get_runtime(),
+                skipped=self._skipped[taskname],
+                importtime=self._importtimes.get(taskname),
+                startuptime=self._startuptimes.get(taskname),
+                warmuptime=self._warmuptimes.get(taskname),
+                stale=taskname in self._staletasks,
+                overruns=self._overruns[taskname],
                 timestamp=self._last_update.jstimestamp(),
                 updates=self._updates,
-                period=self.UPDATE_PERIOD
+                period=self.UPDATE_PERIOD,
+                deviation=self._deviation,
+                late=self._late,
+                flushtime=self._flushtime,
+                snapshot=dict(
+                    time=self._snapshottime,
+                    size=self._snapshotsize
+                ),
+                databases=dict(
+                    (filename, database.serialize())
+                    for filename, database in self._databases.iteritems()
+                ),
+                server=self._server.serialize(),
+                scheduler=self._taskpool.serialize(),
+                lockwait=dict(
+                    (query_type, histogram.serialize())
+                    for query_type, histogram in self._lockwait.iteritems()
+                )
             )
         )
 
-    def _update_taskcachepart_report(self, taskname):
+    # report part and patch of the update, built without
+    # scheduler_lock and published by _update_taskcachepart_report
+    # returns [report json or None if unchanged, patch or None]
+    def _build_taskreport(self, taskname):
         task = self._tasks[taskname]
+
+        # keep last report, but the patch chain
+        # needs an (empty) link for every update
+        # >reports of running tasks are not consistent
+        version = task.get_version()
+        if version == self._versions[taskname] or self._task_busy(taskname):
+            self._skipped[taskname] += 1
+            # nothing published yet, no link needed
+            if self._last_update is None:
+                return [None, None]
+            return [None, [self._last_update.jstimestamp(), str()]]
+        self._versions[taskname] = version
+
+        report = task.report()
+
+        # patch from last published report to this one
+        patch = None
+        lastreport = self._reports[taskname]
+        if lastreport is not None:
+            patch = [
+                self._last_update.jstimestamp(),
+                self.serialize(
+                    self._treediff.diff(lastreport, report)
+                )[1:-1]
+            ]
+        # first report after null reports were published
+        # (first run was busy): replace the root
+        elif self._last_update is not None:
+            patch = [
+                self._last_update.jstimestamp(),
+                self.serialize([["set", list(), report]])[1:-1]
+            ]
+        # report may share containers with the task
+        self._reports[taskname] = self._treediff.copy(report)
+        return [self.serialize(report), patch]
+
+    # needs scheduler_lock
+    # report and patch must be published together with
+    # the timestamp of the update, else a request in between
+    # publishes the new report with the old patch chain
+    def _update_taskcachepart_report(self, taskname, part):
         cp = self._cacheparts[taskname]
-        cp["report"] = self.serialize(
-            task.report()
-        )
+        report, patch = part
+        if report is not None:
+            cp["report"] = report
+        cp["patch"] = patch
+
+    # needs scheduler_lock
+    def _update_taskpatches(self, taskname):
+        cp = self._cacheparts[taskname]
+        if cp["patch"] is None:
+            return
+        self._patches[taskname].append(cp["patch"])
+        cp["patch"] = None
 
     def _update_taskcachepart_request(self, taskname):
         task = self._tasks[taskname]
@@ -222,7 +478,7 @@ class RasPyKernel(RasPyLogger):
             task.get_requests_simple()
         )
 
-    # build cache from parts
+    # build cache from parts and publish it
     # beware: parts are already json strings
     def _update_taskcache(self, taskname):
         cp = self._cacheparts[taskname]
@@ -231,19 +487,127 @@ class RasPyKernel(RasPyLogger):
         newcache += ",\"report\":{}".format(cp["report"])
         newcache += ",\"request\":{}".format(cp["request"])
         newcache += "}"
-        # self._caches[taskname].store(newcache)
-        self._caches[taskname] = newcache
+        self._caches[taskname].store((
+            self._last_update.jstimestamp(),
+            newcache,
+            cp["info"],
+            cp["request"],
+            tuple(self._patches[taskname])
+        ))
+
+    # lock free read of the published cache, the time
+    # it takes goes to the lock-wait histogram of the query
+    def _recall_cache(self, taskname, query_type):
+        dt = time.time()
+        cache = self._caches[taskname].recall()
+        self._lockwait[query_type].add(
+            (time.time() - dt) * 1000.0
+        )
+        return cache
+
+    # lock free
+    # returns [error, cache]
+    def _recall_task(self, taskname, req_timestamp, query_type):
+        cache = self._recall_cache(taskname, query_type)
+
+        # scheduler has run?
+        if cache is None:
+            return [self.ERR_NOTRUNYET, None]
+
+        timestamp, data = cache[0], cache[1]
+        if req_timestamp == timestamp:
+            return [self.ERR_NOTUPDATED, None]
+
+        return [self.ERR_NONE, data]
+
+    # lock free
+    # only send what changed since req_timestamp:
+    # {"info": {}, "base": req_timestamp, "patch": [ops], "request": {}}
+    # see RasPyTreeDiff for ops
+    # falls back to full cache if req_timestamp is too old
+    def _report_task_delta(self, taskname, req_timestamp):
+        cache = self._recall_cache(taskname, self.QRY_REPORT)
+
+        if cache is None:
+            return self.ERR_NOTRUNYET
+
+        timestamp, data, info, request, patches = cache
+        if req_timestamp == timestamp:
+            return self.ERR_NOTUPDATED
+
+        ops = None
+        for i in range(len(patches)):
+            if patches[i][0] == req_timestamp:
+                ops = [p[1] for p in patches[i:] if p[1]]
+                break
+
+        if ops is None:
+            return "{}{}".format(
+                self.ERR_NONE,
+                data
+            )
+
+        delta = "{"
+        delta += "\"info\":{}".format(info)
+        delta += ",\"base\":{}".format(req_timestamp)
+        delta += ",\"patch\":[{}]".format(",".join(ops))
+        delta += ",\"request\":{}".format(request)
+        delta += "}"
+        return "{}{}".format(
+            self.ERR_NONE,
+            delta
+        )
+
+    def _report_task(self, taskname, req_timestamp):
+        error, data = self._recall_task(
+            taskname,
+            req_timestamp,
+            self.QRY_REPORT
+        )
+        if error != self.ERR_NONE:
+            return error
+
+        return "{}{}".format(
+            self.ERR_NONE,
+            data
+        )
+
+    # tasks: list of task names or "*" for all tasks
+    # timestamps: one timestamp for all or dict by task name
+    # every task maps to its cache or to its error code string
+    # beware: caches are already json strings
+    def _report_tasks(self, tasknames, timestamps):
+        if tasknames == "*":
+            tasknames = [task.get_name() for task in self._taskschedule]
+
+        result = "{"
+        for taskname in tasknames:
+            if taskname not in self._caches:
+                error, data = [self.ERR_INVALID_QUERY, None]
+            else:
+                if isinstance(timestamps, dict):
+                    req_timestamp = int(timestamps.get(taskname, 0))
+                else:
+                    req_timestamp = int(timestamps)
+                error, data = self._recall_task(
+                    taskname,
+                    req_timestamp,
+                    self.QRY_REPORTS
+                )
+
+            if len(result) > 1:
+                result += ","
+            result += "{}:".format(self.serialize(taskname))
+            if error != self.ERR_NONE:
+                result += "\"{}\"".format(error)
+            else:
+                result += data
+        result += "}"
 
-    def _report_task(self, taskname):
         return "{}{}".format(
             self.ERR_NONE,
-            self._caches[taskname]
+            result
         )
-        # cache = self._caches[taskname]
-        # return "{}{}".format(
-        #     self.ERR_NONE,
-        #     cache.recall()
-        # )
 
     def _request_task(self, taskname, command, arguments):
         task = self._tasks[taskname]
@@ -270,40 +634,279 @@ class RasPyKernel(RasPyLogger):
         self._update_taskcache(taskname)
         return "{}{}".format(
             self.ERR_NONE,
-            self._caches[taskname]
+            self._caches[taskname].recall()[1]
+        )
+
+    # finest tier which needs at most HISTORY_MAXREAD records
+    def _history_tier(self, start, end):
+        span = end - start
+        if span / self.UPDATE_PERIOD <= self.HISTORY_MAXREAD:
+            return "minute"
+        if span / (60 * 60) <= self.HISTORY_MAXREAD:
+            return "hour"
+        return "day"
+
+    # {"series": name, "start": ts, "end": ts, "tier": "minute",
+    #  "points": count, "method": "lttb"}
+    # start/end default to the last 24h, at most the newest
+    # HISTORY_MAXREAD records are read, start tells where they begin
+    # points decimates to about count points by method, see
+    # DECIMATORS, the tier is picked by range if not given
+    # without series, returns the names of all series
+    def _query_history(self, query):
+        name = query.get("series")
+        if name is None:
+            return "{}{}".format(
+                self.ERR_NONE,
+                self.serialize(self._history.get_names())
+            )
+
+        series = self._history.find(name)
+        if series is None:
+            self.loge("Invalid history: {}".format(name))
+            return self.ERR_INVALID_QUERY
+
+        try:
+            end = int(query.get("end", time.time()))
+            start = int(query.get("start", end - 24 * 60 * 60))
+            count = query.get("points")
+            method = None
+            if count is None:
+                tier = query.get("tier", "minute")
+            else:
+                count = int(count)
+                method = query.get("method", "lttb")
+                if count < 3 or method not in DECIMATORS:
+                    raise ValueError("Invalid decimation")
+                tier = query.get("tier") or self._history_tier(start, end)
+            points = series.read(tier, start, end, self.HISTORY_MAXREAD)
+            # range was cut, start at the oldest point read
+            if len(points) == self.HISTORY_MAXREAD:
+                start = points[0][0]
+            if method is not None:
+                points = DECIMATORS[method](points, count, start, end)
+        except (ValueError, IOError, OSError) as e:
+            self.loge("Failed history query: {}".format(e))
+            return self.ERR_INVALID_QUERY
+
+        return "{}{}".format(
+            self.ERR_NONE,
+            self.serialize(dict(
+                series=name,
+                tier=tier,
+                start=start,
+                end=end,
+                method=method,
+                points=points
+            ))
         )
-        # return cache
-        # cache = self._caches[taskname]
-        # return "{}{}".format(
-        #     self.ERR_NONE,
-        #     cache.recall()
-        # )
 
+    def _task_busy(self, taskname):
+        with self._busytasks_lock:
+            return taskname in self._busytasks
+
+    # called by task pool
+    def _run_task(self, task, finished):
+        self.logd("Run: {}".format(task.get_name()))
+        try:
+            result = task.run()
+        except Exception as e:
+            self.loge("Exception in {}: {}".format(task.get_name(), e))
+            result = False
+        with self._busytasks_lock:
+            self._busytasks.discard(task.get_name())
+        finished.put((task, result))
+
+    # run tasks as soon as their dependencies
+    # within the phase are done.
+    # tasks which overrun their timeout are left behind
+    # in the pool and count as done, so they can not stall
+    # the scheduler. they are not started again until they
+    # have finished
+    def _scheduler_run_phase(self, tasks):
+        pending = list(tasks)
+        phase = set(task.get_name() for task in tasks)
+        done = set()
+        # deadline by task name
+        running = dict()
+        success = True
+        finished = Queue.Queue()
+
+        while pending or running:
+            skipped = len(done)
+            if success:
+                for task in list(pending):
+                    if not all(
+                        name not in phase or name in done
+                        for name in task.get_dependencies()
+                    ):
+                        continue
+
+                    pending.remove(task)
+                    name = task.get_name()
+                    with self._busytasks_lock:
+                        busy = name in self._busytasks
+                        self._busytasks.add(name)
+                    if busy:
+                        self.loge("Still running: {}".format(name))
+                        done.add(name)
+                        continue
+
+                    running[name] = time.time() + self._tasktimeout
+                    self._taskpool.submit(self._run_task, task, finished)
+
+            if not running:
+                # skipped tasks might have unblocked others
+                if pending and len(done) > skipped:
+                    continue
+                break
+
+            try:
+                task, result = finished.get(
+                    True,
+                    max(0, min(running.values()) - time.time())
+                )
+            except Queue.Empty:
+                now = time.time()
+                for name, deadline in running.items():
+                    if deadline > now:
+                        continue
+                    self.loge("Timeout: {}".format(name))
+                    del running[name]
+                    done.add(name)
+                    self._overruns[name] += 1
+                    self._staletasks.add(name)
+                continue
+
+            name = task.get_name()
+            del running[name]
+            done.add(name)
+            self._staletasks.discard(name)
+            if not result:
+                self.loge("Fail: {}".format(name))
+                # let running tasks finish
+                success = False
+
+        return success
+
+    # elevated tasks run after all others
+    # tasks which are not due are skipped
     def _scheduler_run_tasks(self):
+        time = self.get_time()
+        for elevated in [False, True]:
+            if not self._scheduler_run_phase([
+                task for task in self._taskschedule
+                if task.get_elevated() == elevated and task.due(time)
+            ]):
+                return False
+        return True
 
+    # unknown tasks, cycles and elevated dependencies
+    # would stall or break the scheduler
+    def _check_dependencies(self):
         for task in self._taskschedule:
-            self.logd("Run: {}".format(task.get_name()))
-            if not task.run():
-                self.loge("Fail: {}".format(task.get_name()))
-                return False
+            for name in task.get_dependencies():
+                dependency = self.find_task(name)
+                if dependency is None and name in self._registered_tasks():
+                    self.loge("{} depends on disabled task: {}, add it to config tasks".format(
+                        task.get_name(),
+                        name
+                    ))
+                    return False
+                if dependency is None:
+                    self.loge("{} depends on unknown task: {}".format(
+                        task.get_name(),
+                        name
+                    ))
+                    return False
+                if dependency.get_elevated() and not task.get_elevated():
+                    self.loge("{} depends on elevated task: {}".format(
+                        task.get_name(),
+                        name
+                    ))
+                    return False
 
+        done = set()
+        pending = list(self._taskschedule)
+        while pending:
+            ready = [
+                task for task in pending
+                if all(name in done for name in task.get_dependencies())
+            ]
+            if not ready:
+                self.loge("Dependency cycle: {}".format(
+                    ", ".join(task.get_name() for task in pending)
+                ))
+                return False
+            for task in ready:
+                pending.remove(task)
+                done.add(task.get_name())
         return True
 
+    # schema and config, one task after another
     def _startup_tasks(self, config):
-        conn = sqlite3.connect(
-            os.path.join(self._databasepath, self.SQLFILE)
-        )
-        conn.row_factory = sqlite3.Row
-        dbc = conn.cursor()
+        dbc = self._database.cursor()
+
+        snapshot = self._read_snapshot()
+        if snapshot is not None:
+            self._totaltime.restore(
+                snapshot["totaltime"],
+                time.time(),
+                self.UPDATE_PERIOD
+            )
 
         for task in self._taskschedule:
             name = task.get_name()
             self.logd("Startup: {}".format(name))
+            start = self._clock.monotonic()
             if not task.startup(dbc, config.get(name)):
                 return False
+            if snapshot is not None and name in snapshot["tasks"]:
+                self._restore_task(task, snapshot["tasks"][name])
+            self._startuptimes[name] = self._clock.monotonic() - start
 
-        conn.commit()
-        conn.close()
+        self._database.commit()
+        return True
+
+    # called by task pool
+    def _warmup_task(self, task):
+        name = task.get_name()
+        self.logd("Warmup: {}".format(name))
+        start = self._clock.monotonic()
+        try:
+            result = task.warmup()
+        except Exception as e:
+            self.loge("Exception in {}: {}".format(name, e))
+            result = False
+        self._warmuptimes[name] = self._clock.monotonic() - start
+        with self._busytasks_lock:
+            self._busytasks.discard(name)
+        return result
+
+    # slow preparations of all tasks at the same time.
+    # tasks which overrun the timeout stay busy, so the
+    # scheduler does not run them until they are done
+    def _warmup_tasks(self):
+        futures = list()
+        for task in self._taskschedule:
+            with self._busytasks_lock:
+                self._busytasks.add(task.get_name())
+            futures.append([
+                task,
+                self._taskpool.submit(self._warmup_task, task)
+            ])
+
+        deadline = time.time() + self._warmuptimeout
+        for task, future in futures:
+            name = task.get_name()
+            if not future.wait(max(0, deadline - time.time())):
+                self.loge("Warmup timeout: {}".format(name))
+                self._overruns[name] += 1
+                self._staletasks.add(name)
+                continue
+            if not future.result():
+                self.loge("Warmup failed: {}".format(name))
+                return False
         return True
 
     def _shutdown_tasks(self):
@@ -312,20 +915,18 @@ class RasPyKernel(RasPyLogger):
             self.logd("Shutdown: {}".format(task.get_name()))
 
     def _backup_tasks(self):
-        conn = sqlite3.connect(
-            os.path.join(self._databasepath, self.SQLFILE)
-        )
-        conn.row_factory = sqlite3.Row
-        dbc = conn.cursor()
+        dbc = self._database.cursor()
 
         for task in self._taskschedule:
+            if self._task_busy(task.get_name()):
+                self.loge("Backup skipped: {}".format(task.get_name()))
+                continue
             self.logd("Backup: {}".format(task.get_name()))
             if not task.backup(dbc):
                 self.logd("Fail: {}".format(task.get_name()))
                 return False
 
-        conn.commit()
-        conn.close()
+        self._database.commit()
         return True
 
 
@@ -337,47 +938,81 @@ class RasPyKernel(RasPyLogger):
 
         self.logd("Got Query: {}".format(query_type))
 
-        if (
-            query_type == self.QRY_REPORT or
-            query_type == self.QRY_REQUEST
-        ):
+        if query_type == self.QRY_REPORT:
+            # reports are served from the published cache
+            # and never wait for the scheduler
+            # front end lists all tasks, also disabled ones
+            if query["task"] not in self._caches:
+                self.loge("Invalid task: {}".format(query["task"]))
+                query_result = self.ERR_INVALID_QUERY
+            elif query.get("delta", False):
+                self.logd("Return: get report delta")
+                query_result = self._report_task_delta(
+                    query["task"],
+                    int(query["timestamp"])
+                )
+            else:
+                self.logd("Return: get report")
+                query_result = self._report_task(
+                    query["task"],
+                    int(query["timestamp"])
+                )
+
+        elif query_type == self.QRY_REPORTS:
+            # several reports in one round trip
+            self.logd("Return: get reports")
+            query_result = self._report_tasks(
+                query["tasks"],
+                query.get("timestamp", 0)
+            )
+
+        elif query_type == self.QRY_REQUEST:
 
             # wait for scheduler to release
-            # so we can access cache or add new requests
+            # so we can add new requests
+            # > also serializes requests of concurrent server workers
+            dt = time.time()
             self._scheduler_lock.acquire(True)
+            self._lockwait[query_type].add(
+                (time.time() - dt) * 1000.0
+            )
 
             updates = self._updates
             last_update = self._last_update
 
             req_timestamp = int(query["timestamp"])
 
+            # front end lists all tasks, also disabled ones
+            if query["task"] not in self._tasks:
+                self.loge("Invalid task: {}".format(query["task"]))
+                query_result = self.ERR_INVALID_QUERY
             # scheduler has run?
-            if not updates > 0:
+            elif not updates > 0:
                 query_result = self.ERR_NOTRUNYET
             elif req_timestamp == last_update.jstimestamp():
                 query_result = self.ERR_NOTUPDATED
             else:
-                # front end ensures that task is valid!
-                taskname = query["task"]
-                if query_type == self.QRY_REPORT:
-                    self.logd("Return: get report")
-                    query_result = self._report_task(taskname)
-                else:
-                    self.logd("Return: set request + get report")
-                    query_result = self._request_task(
-                        taskname,
-                        query["command"],
-                        query["arguments"]
-                    )
+                self.logd("Return: set request + get report")
+                query_result = self._request_task(
+                    query["task"],
+                    query["command"],
+                    query["arguments"]
+                )
 
             self._scheduler_lock.release()
 
+        elif query_type == self.QRY_HISTORY:
+            # served from disk, never waits for the scheduler
+            self.logd("Return: get history")
+            query_result = self._query_history(query)
+
         elif query_type == self.QRY_PING:
             self.logd("Return: PING")
             query_result = self.ERR_NONE
         elif query_type == self.QRY_EXIT:
             self.logd("Return: EXIT")
             self._running = False
+            self._server.stop()
             query_result = self.ERR_NONE
         else:
             self.loge("Invalid Query: {}".format(query_type))
@@ -413,115 +1048,258 @@ class RasPyKernel(RasPyLogger):
         self._watchdog.cancel()
         self._watchdog.join()
 
-    def _scheduler_run(self):
-        self._current_update = self._timefactory.now().norm()
-        oldmin = self._current_update.minute
-        timer = self.UPDATE_PERIOD
+    # one update of all tasks at _current_update
+    # returns False if RasPy has to quit
+    def _scheduler_update(self):
+        # backup at midnight
+        if self._current_update.new_day():
+            if not self._backup_tasks():
+                return False
 
-        # start watchdog now
-        # attention: if new minute just started, we have to wait period*60s
-        # and wd could overflow, but not with the buffer
-        self._watchdog_start()
-        while not self._scheduler_quit.is_set():
+        # process requests
+        # do not let server add new requests
+        self._scheduler_lock.acquire(True)
+        for task in self._taskschedule:
+            # overran and still running
+            if self._task_busy(task.get_name()):
+                continue
+            task.process_requests()
+        self._scheduler_lock.release()
 
-            # read supply
-            self._supply.read_periodic()
+        runtime = self._clock.monotonic()
+        # run tasks
+        if not self._scheduler_run_tasks():
+            return False
 
-            # sleep thread
-            sleep(self.TICK_RATE)
-            self._current_update = self._timefactory.now().norm()
+        runtime = self._clock.monotonic() - runtime
 
-            # another minute has passed?
-            if oldmin == self._current_update.minute:
-                continue
+        # deferred writes of this update
+        self._flush_databases()
 
-            oldmin = self._current_update.minute
-            timer -= 60
-            if timer != 0:
-                continue
+        # build cache part: report
+        # >reports can be hugh
+        # >json dumps of reports *could* be slow
+        # >total time should track this time too
+        reports = dict()
+        for taskname in self._tasks:
+            reports[taskname] = self._build_taskreport(taskname)
 
-            # reset timer
-            timer = self.UPDATE_PERIOD
+        totaltime = time.time() - self._current_update.timestamp
 
-            # restart watchdog
-            self._watchdog_stop()
-            self._watchdog_start()
+        if totaltime > self.UPDATE_PERIOD_WARN:
+            self.loge("Update period might be too low! need: {}".format(totaltime))
+            for task in self._taskschedule:
+                self.loge("{}: {}".format(
+                    task.get_name(),
+                    task.get_runtime()
+                ))
 
-            # backup at midnight
-            if self._current_update.new_day():
-                if not self._backup_tasks():
-                    self._scheduler_send_exit_query()
-                    break
+            if totaltime > self.UPDATE_PERIOD:
+                self.loge("Update period is too low! Quitting.")
+                return False
 
-            # process requests
-            # do not let server add new requests
-            self._scheduler_lock.acquire(True)
-            for task in self._taskschedule:
-                task.process_requests()
-            self._scheduler_lock.release()
+        # reset supply samples
+        self._supply.clear_samples()
 
-            dt = self._timefactory.now()
-            # run tasks
-            if not self._scheduler_run_tasks():
-                self._scheduler_send_exit_query()
-                break
+        # wait for server to clear lock
+        # > only requests wait here, reports read
+        # > the last published cache meanwhile
+
+        # we can change:
+        # * scheduler states
+        # * task caches
+        self._scheduler_lock.acquire(True)
+        self._updates += 1
+        self._last_update = self._current_update
+        self._runtime = runtime
 
-            dt = self._timefactory.now() - dt
-            runtime = dt.total_seconds()
+        self._totaltime.log(
+            self._current_update.jstimestamp(),
+            totaltime
+        )
 
-            # update cache part: report
-            # >reports can be hugh
-            # >json dumps of reports *could* be slow
-            # >total time should track this time too
-            for taskname in self._tasks:
-                self._update_taskcachepart_report(taskname)
+        # update cache part: info+request, these should be *small*
+        # publish report and patch of this update with them
+        # finally update cache
+        for taskname in self._tasks:
+            self._update_taskcachepart_report(taskname, reports[taskname])
+            self._update_taskcachepart_info(taskname)
+            self._update_taskcachepart_request(taskname)
+            self._update_taskpatches(taskname)
+            self._update_taskcache(taskname)
 
-            dt = self._timefactory.now() - self._current_update
-            totaltime = dt.total_seconds()
+        self._scheduler_lock.release()
 
-            if totaltime > self.UPDATE_PERIOD_WARN:
-                self.loge("Update period might be too low! need: {}".format(totaltime))
-                for task in self._taskschedule:
-                    self.loge("{}: {}".format(
-                        task.get_name(),
-                        task.get_runtime()
-                    ))
+        self._flush_history(False)
+
+        if self._current_update.timestamp % self.SNAPSHOT_PERIOD == 0:
+            self._write_snapshot()
+        return True
+
+    # state of all idle tasks as zlib compressed pickle,
+    # replaces the last snapshot atomically
+    def _write_snapshot(self):
+        start = self._clock.monotonic()
+        for task in self._taskschedule:
+            name = task.get_name()
+            # state of running tasks is not consistent
+            if self._task_busy(name):
+                continue
+            try:
+                self._snapshotstates[name] = task.snapshot()
+            except Exception as e:
+                self.loge("Failed to snapshot {}: {}".format(name, e))
 
-                if totaltime > self.UPDATE_PERIOD:
-                    self.loge("Update period is too low! Quitting.")
-                    self._scheduler_send_exit_query()
-                    break
+        try:
+            data = zlib.compress(cPickle.dumps(
+                dict(
+                    version=self.SNAPSHOT_VERSION,
+                    timestamp=time.time(),
+                    totaltime=self._totaltime.snapshot(),
+                    tasks=self._snapshotstates
+                ),
+                cPickle.HIGHEST_PROTOCOL
+            ))
+        except (cPickle.PicklingError, TypeError) as e:
+            self.loge("Failed to pickle snapshot: {}".format(e))
+            return False
 
-            # reset supply samples
-            self._supply.clear_samples()
+        tmppath = self._snapshotpath + ".tmp"
+        try:
+            with open(tmppath, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.rename(tmppath, self._snapshotpath)
+        except (IOError, OSError) as e:
+            self.loge("Failed to write snapshot: {}".format(e))
+            return False
 
-            # wait for server to clear lock
+        self._snapshottime = self._clock.monotonic() - start
+        self._snapshotsize = len(data)
+        return True
 
-            # 2do: this can lead to slow response times for server request/report
-            # if task cache recreation takes much time (>1s)
+    # last snapshot or None if missing, unreadable or too old
+    def _read_snapshot(self):
+        try:
+            with open(self._snapshotpath, "rb") as f:
+                data = f.read()
+        except IOError:
+            return None
 
-            # we can change:
-            # * scheduler states
-            # * task caches
-            self._scheduler_lock.acquire(True)
-            self._updates += 1
-            self._last_update = self._current_update
-            self._runtime = runtime
+        # anything can be raised by a corrupt pickle
+        try:
+            snapshot = cPickle.loads(zlib.decompress(data))
+        except Exception as e:
+            self.loge("Snapshot is invalid: {}".format(e))
+            return None
+
+        if snapshot.get("version") != self.SNAPSHOT_VERSION:
+            self.logd("Ignoring snapshot of another version")
+            return None
+
+        age = time.time() - snapshot["timestamp"]
+        if not (0 <= age <= self.SNAPSHOT_MAXAGE):
+            self.logd("Ignoring snapshot of age: {}".format(age))
+            return None
+        return snapshot
+
+    # a task without its last state is no reason to quit
+    def _restore_task(self, task, state):
+        name = task.get_name()
+        self.logd("Restore: {}".format(name))
+        try:
+            if not task.restore(state):
+                self.loge("Failed to restore {}".format(name))
+        except Exception as e:
+            self.loge("Exception restoring {}: {}".format(name, e))
+
+    # writes samples of this update to the os,
+    # syncs them every HISTORY_SYNC seconds
+    def _flush_history(self, force_sync):
+        now = self._clock.monotonic()
+        sync = (
+            force_sync or
+            self._history_synced is None or
+            now - self._history_synced >= self.HISTORY_SYNC
+        )
+        try:
+            self._history.flush(sync)
+        except (IOError, OSError) as e:
+            self.loge("Failed to write history: {}".format(e))
+            return
+        if sync:
+            self._history_synced = now
+
+    # wall clock time of the first update after timestamp
+    def _next_update_time(self, timestamp):
+        return (int(timestamp) // self.UPDATE_PERIOD + 1) * self.UPDATE_PERIOD
+
+    # sleeps until the next supply sample or update is due.
+    # samples keep a fixed grid on the monotonic clock,
+    # updates are aligned to wall clock minutes, so they
+    # can not drift away.
+    # a plain sleep: Event.wait() of python 2 polls in steps
+    # of up to 50ms. quit is checked after every sleep, which
+    # is at most TICK_RATE
+    def _scheduler_run(self):
+        self._current_update = RasPyTick(time.time())
+        next_sample = self._clock.monotonic()
+        next_update = self._next_update_time(time.time())
 
-            self._totaltime.log(
-                self._current_update.jstimestamp(),
-                totaltime
-            )
+        # start watchdog now
+        # attention: if new minute just started, we have to wait period*60s
+        # and wd could overflow, but not with the buffer
+        self._watchdog_start()
+        while not self._scheduler_quit.is_set():
 
-            # update cache part: info+report
-            # these should be *small*
-            # finally update cache
-            for taskname in self._tasks:
-                self._update_taskcachepart_info(taskname)
-                self._update_taskcachepart_request(taskname)
-                self._update_taskcache(taskname)
+            # read supply
+            now = self._clock.monotonic()
+            if now >= next_sample:
+                self._supply.read_periodic()
+                next_sample += self.TICK_RATE
+                # missed samples, eg during an update
+                if next_sample <= now:
+                    next_sample = now + self.TICK_RATE
+
+            wall = time.time()
+            # wall clock went back, eg ntp or manual:
+            # do not wait for the old next update
+            if next_update - wall > self.UPDATE_PERIOD:
+                self.loge("Wall clock went back by {:.1f}s".format(
+                    next_update - self.UPDATE_PERIOD - wall
+                ))
+                next_update = self._next_update_time(wall)
+
+            if wall < next_update:
+                time.sleep(max(0, min(
+                    next_sample - self._clock.monotonic(),
+                    next_update - time.time(),
+                    self.TICK_RATE
+                )))
+                continue
 
-            self._scheduler_lock.release()
+            self._deviation = wall - next_update
+            update_time = next_update
+            next_update = self._next_update_time(wall)
+
+            # restart watchdog
+            self._watchdog_stop()
+            self._watchdog_start()
+
+            # eg after a system time change or a blocked scheduler
+            # the update would not belong to its minute anymore
+            if self._deviation > self.MAX_SCHEDULE_DEVIATION:
+                self._late += 1
+                self.loge("Update is {:.1f}s late, skipped".format(
+                    self._deviation
+                ))
+                continue
+
+            self._current_update = RasPyTick(update_time)
+            if not self._scheduler_update():
+                self._scheduler_send_exit_query()
+                break
 
         # stop watchdog
         self._watchdog_stop()
@@ -586,24 +1364,74 @@ class RasPyKernel(RasPyLogger):
         if timeout is not None:
             self._timeout = int(timeout)
 
-        # 5) init wiringpi
+        # 5) setup server
+        servercfg = config.get("server", dict())
+        self._server = RasPyServer(
+            self,
+            self._execute_query,
+            int(servercfg.get("workers", self.SERVER_WORKERS)),
+            self._timeout
+        )
+        self._server_unixpath = servercfg.get("unix")
+
+        if not self._clock.is_monotonic():
+            self.loge("No monotonic clock, using system time")
+
+        # 6) init wiringpi
         wiringpi2.wiringPiSetup()
 
-        # 6) sort by tasks by elevated property
+        # 7) import and create enabled tasks
+        if not self._load_tasks(config):
+            return False
+
+        # 8) sort by tasks by elevated property
         # > non elevated get executed first
         self._taskschedule.sort(
             key=lambda task: (task.get_elevated())
         )
+        if not self._check_dependencies():
+            return False
 
-        # 7) startup tasks
+        # a worker per task, so overrunning
+        # tasks can not block the others
+        schedulercfg = config.get("scheduler", dict())
+        self._taskpool = RasPyThreadPool(
+            "task",
+            int(schedulercfg.get("workers", len(self._taskschedule)))
+        )
+        self._taskpool.start()
+        self._tasktimeout = float(
+            schedulercfg.get("timeout", self.TASK_TIMEOUT)
+        )
+        self._warmuptimeout = float(
+            schedulercfg.get("warmup", self.WARMUP_TIMEOUT)
+        )
+
+        # 9) startup tasks
         if not self._startup_tasks(config):
             return False
 
+        # 10) warmup tasks
+        if not self._warmup_tasks():
+            return False
+
         # create unique startup time latch
         # so web app can detect a version change
         self._instance_id = self._timefactory.now().jstimestamp()
         return True
 
+    # one transaction per database
+    def _flush_databases(self):
+        start = self._clock.monotonic()
+        flushed = 0
+        for filename, database in self._databases.iteritems():
+            try:
+                flushed += database.flush()
+            except sqlite3.Error as e:
+                self.loge("Failed to flush {}: {}".format(filename, e))
+        if flushed:
+            self._flushtime = self._clock.monotonic() - start
+
     def run(self):
 
         if not self._start():
@@ -612,23 +1440,17 @@ class RasPyKernel(RasPyLogger):
 
         # start server
         self.logd("Starting Server")
-        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        server_socket.bind((self.SERVER_HOST, self.SERVER_PORT))
-        server_socket.listen(100)
+        self._server.listen_tcp(self.SERVER_HOST, self.SERVER_PORT)
+        if self._server_unixpath is not None:
+            self._server.listen_unix(self._server_unixpath)
 
         # start scheduler thread
         self.logd("Starting Scheduler")
         scheduler = threading.Thread(target=self._scheduler_run)
         scheduler.start()
 
-        while self._running:
-            # wait for a connection
-            connection, address = server_socket.accept()
-            request = connection.recv(256)
-            response = self._execute_query(address, request)
-            connection.send(response)
-            connection.close()
+        # serve until exit query arrives
+        self._server.serve()
 
         self.logd("Stopped Server")
 
@@ -636,8 +1458,23 @@ class RasPyKernel(RasPyLogger):
         self._scheduler_quit.set()
         # wait for scheduler to stop
         scheduler.join()
+        # workers are daemons: do not wait for
+        # tasks which overran their timeout
+        self._taskpool.stop(wait=False)
+        with self._busytasks_lock:
+            busy = sorted(self._busytasks)
+        if busy:
+            self.loge("Still running on shutdown: {}".format(", ".join(busy)))
         self.logd("Stopped Scheduler")
 
+        # keep state for the next start
+        self._write_snapshot()
+
         # shutdown tasks
         self._shutdown_tasks()
+        self._flush_databases()
+        self._flush_history(True)
+        for database in self._databases.itervalues():
+            database.close()
+        self._database.close()
         return True
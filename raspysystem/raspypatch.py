@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+from raspysamplelogger import RasPyJSONArray
+
+# diff of two json trees as a list of operations,
+# which have to be applied in order:
+#
+#   ["set", path, value]          replace or add value at path
+#   ["del", path]                 remove key at path
+#   ["push", path, values, shift] drop shift items from the front
+#                                 of the list at path, then append values
+#
+# path is a list of dict keys and list indices
+# an empty path addresses the root
+#
+# reports may share lists and dicts with task state, which
+# changes in place, so the old tree has to be a copy()
+class RasPyTreeDiff(object):
+    # max items a ring buffer may rotate between two trees
+    MAX_SHIFT = 16
+
+    def _diff_value(self, old, new, path, ops):
+        if type(old) != type(new):
+            ops.append(["set", path, new])
+        elif isinstance(new, RasPyJSONArray):
+            self._diff_jsonarray(old, new, path, ops)
+        elif isinstance(new, dict):
+            self._diff_dict(old, new, path, ops)
+        elif isinstance(new, list):
+            self._diff_list(old, new, path, ops)
+        elif old != new:
+            ops.append(["set", path, new])
+
+    def _diff_dict(self, old, new, path, ops):
+        for key in old:
+            if key not in new:
+                ops.append(["del", path + [key]])
+        for key, value in new.iteritems():
+            if key not in old:
+                ops.append(["set", path + [key], value])
+            else:
+                self._diff_value(old[key], value, path + [key], ops)
+
+    def _diff_list(self, old, new, path, ops):
+        if old == new:
+            return
+
+        oldlen = len(old)
+        newlen = len(new)
+
+        # appended and/or rotated, eg sample logs
+        # at least one item has to be kept
+        for shift in range(min(oldlen - 1, self.MAX_SHIFT) + 1):
+            keep = oldlen - shift
+            if newlen >= keep and new[:keep] == old[shift:]:
+                ops.append(["push", path, new[keep:], shift])
+                return
+
+        # same layout, diff items if cheaper than replacing
+        if oldlen == newlen:
+            itemops = list()
+            for i in range(newlen):
+                self._diff_value(old[i], new[i], path + [i], itemops)
+            if len(itemops) <= newlen / 2:
+                ops.extend(itemops)
+                return
+
+        ops.append(["set", path, new])
+
+    # pre-serialized arrays of the same ring buffer
+    # only need their appended items
+    def _diff_jsonarray(self, old, new, path, ops):
+        if (
+            old.get_owner() is new.get_owner() and
+            old.get_generation() == new.get_generation()
+        ):
+            shift = new.get_start() - old.get_start()
+            appended = (
+                new.get_start() + new.get_count() -
+                old.get_start() - old.get_count()
+            )
+            if shift == 0 and appended == 0:
+                return
+            if (
+                0 <= shift < old.get_count() and
+                shift <= self.MAX_SHIFT and
+                appended >= 0
+            ):
+                ops.append(["push", path, new.tail(appended), shift])
+                return
+
+        if old.encoded_json != new.encoded_json:
+            ops.append(["set", path, new])
+
+    # copy of the containers of a tree, pre-serialized
+    # arrays and scalars do not change and are kept
+    def copy(self, tree):
+        if isinstance(tree, RasPyJSONArray):
+            return tree
+        if isinstance(tree, dict):
+            return dict(
+                (key, self.copy(value)) for key, value in tree.iteritems()
+            )
+        if isinstance(tree, list):
+            return [self.copy(value) for value in tree]
+        if isinstance(tree, tuple):
+            return tuple(self.copy(value) for value in tree)
+        return tree
+
+    # old has to be a copy() of the last tree
+    def diff(self, old, new):
+        ops = list()
+        self._diff_value(old, new, list(), ops)
+        return ops
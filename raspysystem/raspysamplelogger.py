@@ -1,7 +1,12 @@
 # -*- coding: utf-8 -*-
+import sys
+import simplejson as json
 from math import fsum
+from array import array
 from collections import deque
 
+NAN = float("nan")
+
 class RasPyRange(object):
     def __init__(self):
         self._min = None
@@ -21,6 +26,468 @@ class RasPyRange(object):
     def get_max(self):
         return self._max
 
+# pre-serialized json array of a RasPyRingBuffer
+# gets spliced into reports without encoding it again.
+# knows which items of its buffer it holds, so two
+# fragments of the same buffer can be diffed cheaply
+class RasPyJSONArray(json.RawJSON):
+
+    def __init__(self, encoded_json, owner, generation, start, count):
+        json.RawJSON.__init__(self, encoded_json)
+        self._owner = owner
+        self._generation = generation
+        self._start = start
+        self._count = count
+
+    def get_owner(self):
+        return self._owner
+
+    def get_generation(self):
+        return self._generation
+
+    # running index of first item
+    def get_start(self):
+        return self._start
+
+    def get_count(self):
+        return self._count
+
+    # json array of the last count items
+    def tail(self, count):
+        if count <= 0:
+            return json.RawJSON("[]")
+        if count >= self._count:
+            return json.RawJSON(self.encoded_json)
+        encoded = self.encoded_json
+        pos = len(encoded)
+        for _ in range(count):
+            pos = encoded.rfind(",", 0, pos)
+        return json.RawJSON("[" + encoded[pos + 1:])
+
+# fixed size fifo of numbers in a compact array
+# starts as 32 bit int storage, switches to 64 bit ints for
+# bigger ints and to double storage on the first float.
+# values keep their python type, so to_list() equals the list
+# of appended values: once ints, floats or bools are mixed
+# the kind of every item is stored next to it.
+# None is stored as sentinel: INT_NONE, LONG_NONE or NaN.
+# anything else, eg ints doubles can not hold, falls back
+# to a plain list
+class RasPyRingBuffer(object):
+    INT_NONE = -2**31
+    INT_MAX = 2**31 - 1
+    # not on 32 bit platforms
+    LONG_TYPECODE = "l" if array("l").itemsize == 8 else None
+    LONG_NONE = -2**63
+    LONG_MAX = 2**63 - 1
+    # ints doubles hold exactly
+    DOUBLE_INT_MAX = 2**53
+
+    KIND_FLOAT = 0
+    KIND_INT = 1
+    KIND_BOOL = 2
+
+    def __init__(self, maxlen):
+        self._maxlen = maxlen
+        self._data = array("i")
+        # kind by item once kinds are mixed
+        self._kinds = None
+        # index of oldest item once full
+        self._head = 0
+        # json array of all items, see to_json()
+        self._json = None
+        # running index of oldest item
+        self._start = 0
+        # changes if items are not just appended
+        self._generation = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    # "o" for the plain list
+    def _typecode(self):
+        if isinstance(self._data, list):
+            return "o"
+        return self._data.typecode
+
+    def _none(self, typecode):
+        if typecode == "i":
+            return self.INT_NONE
+        if typecode == "l":
+            return self.LONG_NONE
+        return NAN
+
+    # kind of all items while they are not mixed
+    def _default_kind(self, typecode):
+        if typecode == "d":
+            return self.KIND_FLOAT
+        return self.KIND_INT
+
+    # value at position of the storage
+    def _decode(self, pos):
+        item = self._data[pos]
+        typecode = self._typecode()
+        if typecode == "o":
+            return item
+        if typecode == "d":
+            if item != item:
+                return None
+        elif item == self._none(typecode):
+            return None
+
+        if self._kinds is None:
+            return item
+        kind = self._kinds[pos]
+        if kind == self.KIND_INT:
+            return int(item)
+        if kind == self.KIND_BOOL:
+            return item != 0
+        return item
+
+    def __getitem__(self, index):
+        count = len(self._data)
+        if index < 0:
+            index += count
+        if not (0 <= index < count):
+            raise IndexError(index)
+        if count == self._maxlen:
+            index = (self._head + index) % count
+        return self._decode(index)
+
+    # kind of value, None if it is not a number
+    def _kind(self, value):
+        if type(value) is bool:
+            return self.KIND_BOOL
+        if type(value) in (int, long):
+            return self.KIND_INT
+        if type(value) is float:
+            return self.KIND_FLOAT
+        return None
+
+    # typecode of a storage which holds value and all items
+    def _storage(self, value, kind):
+        typecode = self._typecode()
+        if typecode == "o" or value is None:
+            return typecode
+        if kind is None:
+            return "o"
+
+        if kind == self.KIND_FLOAT:
+            if typecode == "l":
+                # ints of the buffer must fit into doubles
+                none = self.LONG_NONE
+                for x in self._data:
+                    if x != none and abs(x) > self.DOUBLE_INT_MAX:
+                        return "o"
+            return "d"
+
+        if typecode == "d":
+            if abs(value) <= self.DOUBLE_INT_MAX:
+                return "d"
+            return "o"
+        if typecode == "i" and -self.INT_MAX <= value <= self.INT_MAX:
+            return "i"
+        if (
+            self.LONG_TYPECODE is not None and
+            -self.LONG_MAX <= value <= self.LONG_MAX
+        ):
+            return self.LONG_TYPECODE
+        return "o"
+
+    # same positions, same values
+    def _convert(self, typecode):
+        values = [self._decode(pos) for pos in range(len(self._data))]
+        if typecode == "o":
+            self._data = values
+            self._kinds = None
+            return
+
+        default = self._default_kind(self._typecode())
+        if self._kinds is None and default != self._default_kind(typecode):
+            self._kinds = array("b", [default]) * len(values)
+        none = self._none(typecode)
+        self._data = array(typecode, [
+            none if x is None else x for x in values
+        ])
+
+    def append(self, value):
+        kind = self._kind(value)
+        typecode = self._storage(value, kind)
+        if typecode != self._typecode():
+            self._convert(typecode)
+
+        if typecode == "o":
+            item = value
+        elif value is None:
+            item = self._none(typecode)
+            kind = self._default_kind(typecode)
+        else:
+            item = float(value) if typecode == "d" else int(value)
+            # first item of another kind than the others
+            if self._kinds is None and kind != self._default_kind(typecode):
+                self._kinds = array(
+                    "b",
+                    [self._default_kind(typecode)]
+                ) * len(self._data)
+
+        full = len(self._data) == self._maxlen
+        if not full:
+            pos = len(self._data)
+            self._data.append(item)
+            if self._kinds is not None:
+                self._kinds.append(kind)
+        else:
+            pos = self._head
+            self._data[pos] = item
+            if self._kinds is not None:
+                self._kinds[pos] = kind
+            self._head = (self._head + 1) % self._maxlen
+            self._start += 1
+
+        if self._json is not None:
+            self._append_json(self._decode(pos), full)
+
+    # drop first, append last item of cached json array
+    def _append_json(self, value, dropfirst):
+        try:
+            encoded = json.dumps(value)
+        except ValueError:
+            # not encodable, let to_json() fail like the report would
+            self._json = None
+            return
+        cached = self._json
+        if len(self._data) == 1:
+            self._json = "[" + encoded + "]"
+        elif dropfirst:
+            self._json = "".join((
+                "[", cached[cached.index(",") + 1:-1], ",", encoded, "]"
+            ))
+        else:
+            self._json = "".join((cached[:-1], ",", encoded, "]"))
+
+    def clear(self):
+        self._data = array("i")
+        self._kinds = None
+        self._head = 0
+        self._json = None
+        self._start = 0
+        self._generation += 1
+
+    # oldest first
+    def to_list(self):
+        data = self._data
+        head = self._head
+        typecode = self._typecode()
+        if typecode == "o":
+            return data[head:] + data[:head]
+        if self._kinds is not None:
+            count = len(data)
+            return [
+                self._decode((head + i) % count) for i in range(count)
+            ]
+        if typecode == "d":
+            return [
+                None if x != x else x
+                for x in (data[head:] + data[:head]).tolist()
+            ]
+        none = self._none(typecode)
+        return [
+            None if x == none else x
+            for x in (data[head:] + data[:head]).tolist()
+        ]
+
+    # same as json encoding to_list(), but only the
+    # first call encodes all items, afterwards the
+    # cached array is updated by every append
+    def to_json(self):
+        if self._json is None:
+            self._json = json.dumps(self.to_list(), separators=(",", ":"))
+        return RasPyJSONArray(
+            self._json,
+            self,
+            self._generation,
+            self._start,
+            len(self._data)
+        )
+
+    def get_memory(self):
+        if self._typecode() == "o":
+            return sys.getsizeof(self._data) + sum(
+                sys.getsizeof(x) for x in self._data
+            )
+        memory = self._data.buffer_info()[1] * self._data.itemsize
+        if self._kinds is not None:
+            memory += self._kinds.buffer_info()[1] * self._kinds.itemsize
+        return memory
+
+# timestamps of a fifo
+# equidistant timestamps are implicit: first + index * period
+# switches to explicit storage if a timestamp does not fit
+class RasPyTimeline(object):
+
+    def __init__(self, maxlen):
+        self._maxlen = maxlen
+        self._first = None
+        self._period = None
+        self._count = 0
+        self._explicit = None
+
+    def __len__(self):
+        if self._explicit is not None:
+            return len(self._explicit)
+        return self._count
+
+    def __getitem__(self, index):
+        if self._explicit is not None:
+            return self._explicit[index]
+        if index < 0:
+            index += self._count
+        if not (0 <= index < self._count):
+            raise IndexError(index)
+        if index == 0:
+            return self._first
+        return self._first + index * self._period
+
+    def _make_explicit(self):
+        explicit = RasPyRingBuffer(self._maxlen)
+        for i in range(self._count):
+            explicit.append(self[i])
+        self._explicit = explicit
+
+    def append(self, timestamp):
+        if self._explicit is not None:
+            self._explicit.append(timestamp)
+            return
+
+        if self._count == 0 or self._maxlen == 1:
+            self._first = timestamp
+            self._count = 1
+            return
+
+        if self._period is None:
+            period = timestamp - self._first
+            if period > 0:
+                self._period = period
+                self._count = 2
+                return
+        elif timestamp == self._first + self._count * self._period:
+            if self._count < self._maxlen:
+                self._count += 1
+            else:
+                self._first += self._period
+            return
+
+        # not equidistant
+        self._make_explicit()
+        self._explicit.append(timestamp)
+
+    def clear(self):
+        self._first = None
+        self._period = None
+        self._count = 0
+        self._explicit = None
+
+    def get_memory(self):
+        if self._explicit is not None:
+            return self._explicit.get_memory()
+        return 0
+
+# exact running sum of floats
+# keeps non overlapping partials (shewchuk), so adding and
+# removing values is exact and get_sum() equals fsum() of all
+# values currently added. expects finite values.
+class RasPyExactSum(object):
+    def __init__(self):
+        self._partials = list()
+
+    def clear(self):
+        del self._partials[:]
+
+    def add(self, x):
+        x = float(x)
+        partials = self._partials
+        i = 0
+        for y in partials:
+            if abs(x) < abs(y):
+                x, y = y, x
+            hi = x + y
+            lo = y - (hi - x)
+            if lo:
+                partials[i] = lo
+                i += 1
+            x = hi
+        partials[i:] = [x]
+
+    def sub(self, x):
+        self.add(-x)
+
+    def get_sum(self):
+        return fsum(self._partials)
+
+# running statistics of the last <size> samples
+# samples are identified by their running index
+class RasPyWindow(object):
+    def __init__(self, size):
+        self._size = size
+        self._sum = RasPyExactSum()
+        self._count = 0
+        # monotonic (index, value) queues
+        # front is the oldest min/max
+        self._minq = deque()
+        self._maxq = deque()
+
+    def get_size(self):
+        return self._size
+
+    def clear(self):
+        self._sum.clear()
+        self._count = 0
+        self._minq.clear()
+        self._maxq.clear()
+
+    def push(self, index, sample):
+        if sample is None:
+            return
+        self._sum.add(sample)
+        self._count += 1
+        # keep older equal values, so front is the first occurrence
+        while self._minq and self._minq[-1][1] > sample:
+            self._minq.pop()
+        self._minq.append((index, sample))
+        while self._maxq and self._maxq[-1][1] < sample:
+            self._maxq.pop()
+        self._maxq.append((index, sample))
+
+    # sample with index leaves the window
+    def pop(self, index, sample):
+        if sample is None:
+            return
+        self._count -= 1
+        if self._count == 0:
+            self._sum.clear()
+        else:
+            self._sum.sub(sample)
+        if self._minq and self._minq[0][0] == index:
+            self._minq.popleft()
+        if self._maxq and self._maxq[0][0] == index:
+            self._maxq.popleft()
+
+    def get_average(self):
+        if self._count == 0:
+            return None
+        return self._sum.get_sum() / self._count
+
+    # (index, value) or None
+    def get_min(self):
+        if self._count == 0:
+            return None
+        return self._minq[0]
+
+    def get_max(self):
+        if self._count == 0:
+            return None
+        return self._maxq[0]
+
 # multi window moving average
 class RasPyMovingAverager(object):
 
@@ -29,11 +496,13 @@ class RasPyMovingAverager(object):
     # no duplicates
     # maxlen => max(windows)
     def __init__(self, windows):
-        self._samples_list = list()
-        self._samples = deque(maxlen=windows[-1])
+        self._samples = RasPyRingBuffer(windows[-1])
         self._averages = [None for _ in windows]
         self._ranges = [RasPyRange() for _ in windows]
         self._windows = windows
+        self._windowstats = [RasPyWindow(win) for win in windows]
+        # running index of next sample
+        self._index = 0
 
     def get_averages(self):
         return self._averages
@@ -45,54 +514,49 @@ class RasPyMovingAverager(object):
         return self._windows
 
     def clear(self):
-        del self._samples_list[:]
         self._samples.clear()
+        self._index = 0
         for i in range(len(self._windows)):
             self._averages[i] = None
             self._ranges[i].clear()
+            self._windowstats[i].clear()
 
-    # samples is array of windows
-    def calc_average(self, vsample_list):
-        for i in range(len(self._windows)):
-            vsamples = vsample_list[i]
-            average = None
-            if len(vsamples) > 0:
-                average = fsum(vsamples) / len(vsamples)
-            self._averages[i] = average
-
-    # samples is array of windows
-    def calc_range(self, vsample_list):
-        for i in range(len(self._windows)):
-            vsamples = vsample_list[i]
-            minval = None
-            maxval = None
-            if len(vsamples) > 0:
-                minval = min(vsamples)
-                maxval = max(vsamples)
-            self._ranges[i].set_values(minval, maxval)
-
-    def postprocess_valid_samples(self, valid_samples_list):
-        self.calc_average(valid_samples_list)
-        self.calc_range(valid_samples_list)
+    # sample by running index, must be in biggest window
+    def get_sample(self, index):
+        return self._samples[index - self._index]
 
     def append(self, sample):
-        # append sample
-        self._samples.append(sample)
-        # update samples list
-        self._samples_list = [x for x in self._samples]
-        valid_samples = [
-            [
-                # get window[x] items
-                # starting from latest(==back of array)
-                x for x in self._samples_list[-win:] if x is not None
-            ] for win in self._windows
-        ]
-        self.postprocess_valid_samples(valid_samples)
+        # nan and inf would stick in the running sums,
+        # ring buffers keep nan as None anyway
+        if type(sample) is float and sample - sample != 0.0:
+            sample = None
+
+        index = self._index
+        samples = self._samples
+
+        for i in range(len(self._windows)):
+            window = self._windowstats[i]
+            size = window.get_size()
+            # oldest sample leaves the window
+            if len(samples) >= size:
+                window.pop(index - size, samples[-size])
+            window.push(index, sample)
+
+            self._averages[i] = window.get_average()
+            minval = window.get_min()
+            maxval = window.get_max()
+            self._ranges[i].set_values(
+                None if minval is None else minval[1],
+                None if maxval is None else maxval[1]
+            )
+
+        samples.append(sample)
+        self._index += 1
 
     def serialize(self):
         return dict(
             windows=self._windows,
-            averages=self._averages,
+            averages=list(self._averages),
             ranges=[
                 [
                     r.get_min(),
@@ -108,12 +572,20 @@ class RasPySampleLogger(RasPyMovingAverager):
     # ->BIGGEST ELEMENT IN WINDOWS !== MAXLOG!
     def __init__(self, maxlog, windows=list()):
         RasPyMovingAverager.__init__(self, windows + [maxlog])
-        self._avgsamples = deque(maxlen=maxlog)
+        self._avgsamples = RasPyRingBuffer(maxlog)
         # track timestamps for min/max time
-        self._timestamps = deque(maxlen=maxlog)
+        self._timestamps = RasPyTimeline(maxlog)
         # min/max time of the biggest array
         self._mintime = None
         self._maxtime = None
+        # history on disk, see kernel.register_logger()
+        self._series = None
+
+    def set_series(self, series):
+        self._series = series
+
+    def get_series(self):
+        return self._series
 
     def get_last_sample(self):
         if len(self._samples) > 0:
@@ -135,43 +607,72 @@ class RasPySampleLogger(RasPyMovingAverager):
         RasPyMovingAverager.clear(self)
         self._avgsamples.clear()
         self._timestamps.clear()
-        self._starttime = None
         self._mintime = None
         self._maxtime = None
 
-    def postprocess_valid_samples(self, valid_samples_list):
-        RasPyMovingAverager.postprocess_valid_samples(
-            self,
-            valid_samples_list
+    # in bytes, sample storage only
+    def get_memory(self):
+        return (
+            self._samples.get_memory() +
+            self._avgsamples.get_memory() +
+            self._timestamps.get_memory()
         )
-        # update min/max timestamps
-        # find index of min, max of total sample array
-        self._mintime = None
-        self._maxtime = None
-        if len(valid_samples_list[-1]) > 0:
-            self._mintime = self._timestamps[
-                valid_samples_list[-1].index(
-                    self._ranges[-1].get_min()
-                )
-            ]
-            self._maxtime = self._timestamps[
-                valid_samples_list[-1].index(
-                    self._ranges[-1].get_max()
-                )
-            ]
+
+    # timestamp by running index
+    def _get_timestamp(self, index):
+        return self._timestamps[index - self._index]
 
     # add separated log to recalculate start time
     def log(self, timestamp, sample):
+        if self._series is not None:
+            self._series.append(timestamp, sample)
         self._timestamps.append(timestamp)
         self.append(sample)
         self._avgsamples.append(self._averages[-1])
 
+        # update min/max timestamps of total sample array
+        # first occurrence wins
+        minval = self._windowstats[-1].get_min()
+        maxval = self._windowstats[-1].get_max()
+        self._mintime = None if minval is None else (
+            self._get_timestamp(minval[0])
+        )
+        self._maxtime = None if maxval is None else (
+            self._get_timestamp(maxval[0])
+        )
+
+    # picklable samples for a restart, see restore()
+    def snapshot(self):
+        return dict(
+            timestamps=[
+                self._timestamps[i] for i in range(len(self._timestamps))
+            ],
+            samples=self._samples.to_list()
+        )
+
+    # logs the samples of snapshot() again.
+    # every period seconds missed until timestamp is logged as None
+    def restore(self, state, timestamp, period):
+        self.clear()
+        timestamps = state["timestamps"]
+        for ts, sample in zip(timestamps, state["samples"]):
+            self.log(ts, sample)
+
+        if not timestamps or period <= 0:
+            return
+        last = timestamps[-1]
+        missed = int(timestamp - last) // period
+        # older ones would be dropped anyway
+        skip = max(0, missed - self._windows[-1])
+        for i in range(skip + 1, missed + 1):
+            self.log(last + i * period, None)
+
     # overload
     def serialize(self):
         output = RasPyMovingAverager.serialize(self)
         output.update(dict(
-            samples=self._samples_list,
-            avgsamples=[x for x in self._avgsamples],
+            samples=self._samples.to_json(),
+            avgsamples=self._avgsamples.to_json(),
             starttime=self.get_start_time(),
             mintime=self._mintime,
             maxtime=self._maxtime,
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+# when a task has to run, cron like:
+#
+#   "<minute> [<hour>]"
+#
+# every field is a comma separated list of
+#   *       every value
+#   n       exactly n
+#   */s     every s, starting at 0
+#   n/s     every s, starting at n
+#
+# eg "*/15" every quarter, "7/15" at 7, 22, 37 and 52 past,
+# "0 6,18" at 06:00 and 18:00
+#
+# beware: the kernel only checks on updates, so matching
+# minutes must be multiples of its period. eg with a period
+# of 300s "7/15" is never due, see get_missed()
+class RasPySchedule(object):
+
+    def __init__(self, spec, initial=False):
+        self._spec = spec
+        # run on first update, no matter the spec
+        self._initial = initial
+
+        fields = spec.split()
+        if len(fields) < 1 or len(fields) > 2:
+            raise ValueError("Invalid schedule: {}".format(spec))
+        if len(fields) == 1:
+            fields.append("*")
+
+        self._minutes = self._parse(fields[0], 60)
+        self._hours = self._parse(fields[1], 24)
+
+    def _parse(self, field, limit):
+        values = set()
+        for item in field.split(","):
+            start, _, step = item.partition("/")
+            step = int(step) if step else 1
+            if start == "*":
+                start = 0
+                stop = limit
+            else:
+                start = int(start)
+                stop = limit if "/" in item else start + 1
+            if step < 1 or start < 0 or start >= limit:
+                raise ValueError("Invalid schedule: {}".format(self._spec))
+            values.update(range(start, stop, step))
+        return frozenset(values)
+
+    def get_spec(self):
+        return self._spec
+
+    # minutes of the spec without an update, every
+    # period seconds aligned to the wall clock
+    def get_missed(self, period):
+        checked = set((t // 60) % 60 for t in range(0, 60 * 60, period))
+        return sorted(self._minutes - checked)
+
+    # never due with updates every period seconds
+    def never_due(self, period):
+        return len(self.get_missed(period)) == len(self._minutes)
+
+    def matches(self, time):
+        return time.minute in self._minutes and time.hour in self._hours
+
+    # first: task has never run
+    def due(self, time, first):
+        return (first and self._initial) or self.matches(time)
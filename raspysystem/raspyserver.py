@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import stat
+import struct
+import socket
+import select
+import threading
+import simplejson as json
+
+from raspylogger import RasPyLogger
+from raspythreadpool import RasPyThreadPool
+
+# query protocol
+#
+# legacy (version 0):
+#   client sends one json query and reads the response until close
+#
+# framed (version 1):
+#   client sends MAGIC + chr(version) once,
+#   then any number of frames: !I length + json query
+#   server answers every frame in order: !I length + response
+#   frames may be pipelined, the connection is kept alive
+#   until the client closes it or it idles for KEEPALIVE_TIMEOUT
+
+class RasPyConnection(object):
+
+    def __init__(self, sock, address):
+        self._socket = sock
+        self._address = address
+        self._version = None
+        self._last_active = time.time()
+
+    # needed by select
+    def fileno(self):
+        return self._socket.fileno()
+
+    def get_socket(self):
+        return self._socket
+
+    def get_address(self):
+        return self._address
+
+    def get_version(self):
+        return self._version
+
+    def set_version(self, version):
+        self._version = version
+
+    def get_last_active(self):
+        return self._last_active
+
+    def touch(self):
+        self._last_active = time.time()
+
+    def close(self):
+        try:
+            self._socket.close()
+        except socket.error:
+            pass
+
+# accepts query connections and hands them
+# over to a pool of workers, so one slow client
+# does not block the others.
+# idle keep-alive connections are watched by the
+# accept loop and do not occupy a worker
+class RasPyServer(RasPyLogger):
+    # in seconds, how often idle connections are checked
+    ACCEPT_TIMEOUT = 1.0
+    KEEPALIVE_TIMEOUT = 60.0
+
+    MAGIC = "RPY"
+    PROTOCOL_LEGACY = 0
+    PROTOCOL_FRAMED = 1
+    PROTOCOL_VERSIONS = (PROTOCOL_FRAMED,)
+
+    FRAME_HEADER = struct.Struct("!I")
+    # max length of a single query
+    QUERY_MAXLEN = 64 * 1024
+    RECV_SIZE = 4096
+
+    def __init__(self, parent, handler, workers, timeout):
+        RasPyLogger.__init__(self, parent, "server")
+
+        # handler(address, query) -> response string
+        self._handler = handler
+        self._timeout = timeout
+        self._pool = RasPyThreadPool("server", workers)
+        self._sockets = list()
+        self._unixpaths = list()
+        self._running = False
+
+        # keep-alive connections waiting for the next query
+        self._idle = list()
+        self._idle_lock = threading.Lock()
+        # wakes up select if a connection becomes idle
+        self._wakeup_r, self._wakeup_w = os.pipe()
+
+        # updated by workers and the accept loop
+        self._queries = 0
+        self._errors = 0
+        self._connections = 0
+        self._stats_lock = threading.Lock()
+
+    def get_pool(self):
+        return self._pool
+
+    def listen_tcp(self, host, port):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        sock.listen(100)
+        self._sockets.append(sock)
+        self.logd("Listening on {}:{}".format(host, port))
+
+    def listen_unix(self, path):
+        # remove stale socket file of previous instance
+        if os.path.exists(path):
+            os.remove(path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(path)
+        # webserver runs as another user
+        os.chmod(path, (
+            stat.S_IRUSR | stat.S_IWUSR |
+            stat.S_IRGRP | stat.S_IWGRP |
+            stat.S_IROTH | stat.S_IWOTH
+        ))
+        sock.listen(100)
+        self._sockets.append(sock)
+        self._unixpaths.append(path)
+        self.logd("Listening on {}".format(path))
+
+    # None if peer closed connection
+    def _recv_exact(self, sock, length):
+        data = str()
+        while len(data) < length:
+            chunk = sock.recv(length - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    # legacy clients do not frame their query
+    # so read until it is a complete json object
+    def _recv_legacy(self, sock, data):
+        while True:
+            try:
+                json.loads(data)
+                return data
+            except ValueError:
+                pass
+
+            if len(data) > self.QUERY_MAXLEN:
+                return None
+
+            chunk = sock.recv(self.RECV_SIZE)
+            if not chunk:
+                return None
+            data += chunk
+
+    def _query(self, connection, query):
+        response = self._handler(connection.get_address(), query)
+        with self._stats_lock:
+            self._queries += 1
+        return response
+
+    # returns True if connection should be kept alive
+    def _process(self, connection):
+        sock = connection.get_socket()
+
+        if connection.get_version() is None:
+            head = self._recv_exact(sock, 1)
+            if head is None:
+                return False
+
+            if head == "{":
+                query = self._recv_legacy(sock, head)
+                if query is None:
+                    self.loge("Invalid legacy query")
+                    return False
+                connection.set_version(self.PROTOCOL_LEGACY)
+                sock.sendall(self._query(connection, query))
+                return False
+
+            head += self._recv_exact(sock, len(self.MAGIC)) or str()
+            if (
+                len(head) != len(self.MAGIC) + 1 or
+                head[:-1] != self.MAGIC or
+                ord(head[-1]) not in self.PROTOCOL_VERSIONS
+            ):
+                self.loge("Unsupported protocol")
+                return False
+
+            connection.set_version(ord(head[-1]))
+
+        # answer all pipelined frames
+        while True:
+            header = self._recv_exact(sock, self.FRAME_HEADER.size)
+            if header is None:
+                return False
+
+            length = self.FRAME_HEADER.unpack(header)[0]
+            if length > self.QUERY_MAXLEN:
+                self.loge("Query is too long: {}".format(length))
+                return False
+
+            query = self._recv_exact(sock, length)
+            if query is None:
+                return False
+
+            response = self._query(connection, query)
+            sock.sendall(
+                self.FRAME_HEADER.pack(len(response)) + response
+            )
+
+            # more frames waiting?
+            readable, _, _ = select.select([sock], [], [], 0)
+            if not readable:
+                return True
+
+    # called by workers
+    def _serve_connection(self, connection):
+        keepalive = False
+        try:
+            connection.get_socket().settimeout(self._timeout)
+            keepalive = self._process(connection)
+        except socket.error as e:
+            with self._stats_lock:
+                self._errors += 1
+            self.loge("Connection error: {}".format(e))
+        except Exception as e:
+            with self._stats_lock:
+                self._errors += 1
+            self.loge("Query failed: {}".format(e))
+
+        if not keepalive or not self._running:
+            connection.close()
+            return
+
+        # hand back to accept loop
+        connection.touch()
+        with self._idle_lock:
+            self._idle.append(connection)
+        os.write(self._wakeup_w, "x")
+
+    def _accept(self, sock):
+        try:
+            client, address = sock.accept()
+        except socket.error as e:
+            self.loge("Accept failed: {}".format(e))
+            return
+        with self._stats_lock:
+            self._connections += 1
+        self._pool.submit(
+            self._serve_connection,
+            RasPyConnection(client, address)
+        )
+
+    def _resume(self, connection):
+        with self._idle_lock:
+            self._idle.remove(connection)
+        self._pool.submit(self._serve_connection, connection)
+
+    def _close_expired(self):
+        deadline = time.time() - self.KEEPALIVE_TIMEOUT
+        with self._idle_lock:
+            expired = [
+                c for c in self._idle if c.get_last_active() < deadline
+            ]
+            for connection in expired:
+                self._idle.remove(connection)
+        for connection in expired:
+            connection.close()
+
+    # blocks until stop() is called
+    def serve(self):
+        self._running = True
+        self._pool.start()
+
+        while self._running:
+            with self._idle_lock:
+                idle = list(self._idle)
+
+            try:
+                readable, _, _ = select.select(
+                    self._sockets + idle + [self._wakeup_r], [], [],
+                    self.ACCEPT_TIMEOUT
+                )
+            except select.error as e:
+                self.loge("Select failed: {}".format(e))
+                continue
+
+            for item in readable:
+                if item is self._wakeup_r:
+                    os.read(self._wakeup_r, self.RECV_SIZE)
+                elif item in self._sockets:
+                    self._accept(item)
+                else:
+                    self._resume(item)
+
+            self._close_expired()
+
+        for sock in self._sockets:
+            sock.close()
+        del self._sockets[:]
+        for path in self._unixpaths:
+            if os.path.exists(path):
+                os.remove(path)
+
+        # let workers finish pending queries
+        self._pool.stop()
+
+        with self._idle_lock:
+            for connection in self._idle:
+                connection.close()
+            del self._idle[:]
+
+    # may be called by any thread
+    def stop(self):
+        self._running = False
+        os.write(self._wakeup_w, "x")
+
+    def serialize(self):
+        with self._stats_lock:
+            stats = dict(
+                queries=self._queries,
+                errors=self._errors,
+                connections=self._connections
+            )
+        with self._idle_lock:
+            stats["keepalive"] = len(self._idle)
+        stats["pool"] = self._pool.serialize()
+        return stats
@@ -24,6 +24,10 @@ class RasPySimpleTask(RasPyLogger):
         bool=[types.BooleanType]
     )
 
+    # report might change on every run
+    # tasks which know better call set_dirty() themselves
+    DIRTY_ON_RUN = True
+
     def __init__(self, parent, name):
 
         RasPyLogger.__init__(
@@ -36,6 +40,13 @@ class RasPySimpleTask(RasPyLogger):
         self._parent = parent
         self._request_descriptions = dict()
         self._requests = dict()
+        # increased whenever the report changed
+        self._version = 0
+        # names of tasks which have to run before me
+        self._dependencies = list()
+        # None runs on every update
+        self._schedule = None
+        self._runs = 0
 
     def _config_expect(self, items, config):
         for item in items:
@@ -61,6 +72,68 @@ class RasPySimpleTask(RasPyLogger):
     def get_name(self):
         return self._name
 
+    # "<task>.<subtask>"
+    def get_fullname(self):
+        if isinstance(self._parent, RasPySimpleTask):
+            return "{}.{}".format(self._parent.get_fullname(), self._name)
+        return self._name
+
+    # keep history of logger beyond 24h
+    # as series "<fullname>.<name>"
+    def register_logger(self, name, logger):
+        self.kernel().register_logger(
+            "{}.{}".format(self.get_fullname(), name),
+            logger
+        )
+
+    # tasks run in parallel, so declare every
+    # task whose state is read by run_event()
+    # subtasks of the same task run in order anyway
+    def add_dependency(self, taskname):
+        if taskname not in self._dependencies:
+            self._dependencies.append(taskname)
+
+    def add_dependencies(self, tasknames):
+        for taskname in tasknames:
+            self.add_dependency(taskname)
+
+    def get_dependencies(self):
+        return self._dependencies
+
+    def set_schedule(self, schedule):
+        # the kernel only checks on updates
+        if schedule.never_due(self.period()):
+            self.loge("Schedule is never due with an update period of {}s: {}".format(
+                self.period(),
+                schedule.get_spec()
+            ))
+        self._schedule = schedule
+
+    def get_schedule(self):
+        return self._schedule
+
+    def get_runs(self):
+        return self._runs
+
+    # called by scheduler
+    def due(self, time):
+        if self._schedule is None:
+            return True
+        return self._schedule.due(time, self._runs == 0)
+
+    # called by scheduler after run_event passed
+    def mark_run(self):
+        self._runs += 1
+        if self.DIRTY_ON_RUN:
+            self.set_dirty()
+
+    def set_dirty(self):
+        self._version += 1
+
+    # kernel only serializes reports of changed versions
+    def get_version(self):
+        return self._version
+
     def parent(self):
         return self._parent
 
@@ -124,6 +197,8 @@ class RasPySimpleTask(RasPyLogger):
 
     # called by scheduler
     def process_requests(self):
+        if self._requests:
+            self.set_dirty()
         for name, request in self._requests.iteritems():
             request[0](request[1], True)
         # all request processed
@@ -133,6 +208,14 @@ class RasPySimpleTask(RasPyLogger):
     def report(self):
         return self.report_event()
 
+    # called by kernel, see snapshot_event()
+    def snapshot(self):
+        return self.snapshot_event()
+
+    # called by kernel after startup
+    def restore(self, state):
+        return self.restore_event(state)
+
     # called by server
     def request(self, command, arguments):
         return self.request_event(command, arguments)
@@ -199,9 +282,25 @@ class RasPySimpleTask(RasPyLogger):
     def startup_event(self, db, cfg):
         return True
 
+    # after startup_event of all tasks
+    # for slow preparations, runs in parallel to other tasks
+    def warmup_event(self):
+        return True
+
     def backup_event(self, db):
         return True
 
+    # picklable in-memory state (logs, counters, caches)
+    # which should survive a restart, None for nothing
+    def snapshot_event(self):
+        return None
+
+    # state of snapshot_event() before the restart
+    # called after startup_event, logs have to fill the
+    # downtime until self.time() with None
+    def restore_event(self, state):
+        return True
+
     def shutdown_event(self):
         pass
 
@@ -214,15 +313,12 @@ class RasPySimpleTask(RasPyLogger):
 class RasPyTask(RasPySimpleTask):
 
     def __init__(self, kernel, name, elevated=False):
-    #, period=1, period_exact=True
 
         RasPySimpleTask.__init__(
             self,
             kernel,
             name
         )
-        # self._period = period
-        # self._period_exact = period_exact
         self._elevated = elevated
         self._runtime = 0
         self._subtasks = list()
@@ -247,6 +343,33 @@ class RasPyTask(RasPySimpleTask):
     def get_elevated(self):
         return self._elevated
 
+    # overload
+    # merged with subtasks dependencies
+    def get_dependencies(self):
+        dependencies = list()
+        for task in [self] + self._subtasks:
+            for taskname in RasPySimpleTask.get_dependencies(task):
+                if taskname != self._name and taskname not in dependencies:
+                    dependencies.append(taskname)
+        return dependencies
+
+    # overload
+    # i or any subtask
+    def due(self, time):
+        if RasPySimpleTask.due(self, time):
+            return True
+        for task in self._subtasks:
+            if task.due(time):
+                return True
+        return False
+
+    # overload
+    def get_version(self):
+        version = self._version
+        for task in self._subtasks:
+            version += task.get_version()
+        return version
+
     # run after subtasks
     def postrun_event(self):
         return True
@@ -311,6 +434,14 @@ class RasPyTask(RasPySimpleTask):
 
         return True
 
+    def warmup(self):
+        if not self.warmup_event():
+            return False
+        for task in self._subtasks:
+            if not task.warmup_event():
+                return False
+        return True
+
     def backup(self, db):
         if not self.backup_event(db):
             return False
@@ -319,28 +450,59 @@ class RasPyTask(RasPySimpleTask):
                 return False
         return True
 
+    # overload
+    # state of subtasks by name
+    def snapshot(self):
+        subtasks = dict()
+        for task in self._subtasks:
+            state = task.snapshot_event()
+            if state is not None:
+                subtasks[task.get_name()] = state
+        return dict(
+            task=self.snapshot_event(),
+            subtasks=subtasks
+        )
+
+    # overload
+    def restore(self, state):
+        if state["task"] is not None:
+            if not self.restore_event(state["task"]):
+                return False
+        for task in self._subtasks:
+            taskstate = state["subtasks"].get(task.get_name())
+            if taskstate is None:
+                continue
+            if not task.restore_event(taskstate):
+                return False
+        return True
+
     def shutdown(self):
         self.shutdown_event()
         for task in self._subtasks:
             task.shutdown_event()
 
     def run(self):
-        tf = self.kernel().get_timefactory()
-        dt = tf.now()
+        clock = self.kernel().get_clock()
+        start = clock.monotonic()
+        time = self.time()
 
         # run =========
-        if not self.run_event():
-            return False
+        if RasPySimpleTask.due(self, time):
+            if not self.run_event():
+                return False
+            self.mark_run()
         # run child events
         for task in self._subtasks:
+            if not task.due(time):
+                continue
             if not task.run_event():
                 return False
+            task.mark_run()
         # =============
 
         # run post event
         if not self.postrun_event():
             return False
 
-        dt = tf.now() - dt
-        self._runtime = dt.total_seconds()
+        self._runtime = clock.monotonic() - start
         return True
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+import sys
+import threading
+import Queue
+
+# result of a job submitted to the pool
+class RasPyFuture(object):
+    def __init__(self):
+        self._done = threading.Event()
+        self._result = None
+        self._exc_info = None
+
+    def set_result(self, result):
+        self._result = result
+        self._done.set()
+
+    def set_exception(self, exc_info):
+        self._exc_info = exc_info
+        self._done.set()
+
+    def done(self):
+        return self._done.is_set()
+
+    # returns False if timeout occured
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def failed(self):
+        return self._exc_info is not None
+
+    # reraises exceptions of the job
+    def result(self):
+        if self._exc_info is not None:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._result
+
+# fixed number of worker threads
+# fed by a fifo queue
+class RasPyThreadPool(object):
+
+    def __init__(self, name, workers):
+        self._name = name
+        self._workers = max(1, int(workers))
+        self._threads = list()
+        self._queue = Queue.Queue()
+        # busy workers and max backlog, updated by
+        # workers and submitting threads
+        self._busy = 0
+        self._backlog_max = 0
+        self._stats_lock = threading.Lock()
+
+    def get_workers(self):
+        return self._workers
+
+    # jobs which wait for a worker
+    def get_backlog(self):
+        return self._queue.qsize()
+
+    def get_backlog_max(self):
+        return self._backlog_max
+
+    def get_busy(self):
+        return self._busy
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            # stop marker
+            if job is None:
+                break
+
+            future, func, args = job
+
+            with self._stats_lock:
+                self._busy += 1
+            try:
+                future.set_result(func(*args))
+            except Exception:
+                future.set_exception(sys.exc_info())
+            finally:
+                with self._stats_lock:
+                    self._busy -= 1
+
+    def start(self):
+        for i in range(self._workers):
+            thread = threading.Thread(
+                target=self._worker,
+                name="{}{}".format(self._name, i)
+            )
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, func, *args):
+        future = RasPyFuture()
+        self._queue.put((future, func, args))
+        backlog = self._queue.qsize()
+        with self._stats_lock:
+            self._backlog_max = max(self._backlog_max, backlog)
+        return future
+
+    # queued jobs are still processed
+    def stop(self, wait=True):
+        for _ in self._threads:
+            self._queue.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        del self._threads[:]
+
+    def serialize(self):
+        backlog = self.get_backlog()
+        with self._stats_lock:
+            return dict(
+                workers=self._workers,
+                busy=self._busy,
+                backlog=backlog,
+                backlog_max=self._backlog_max
+            )
@@ -1,6 +1,27 @@
 # -*- coding: utf-8 -*-
+import time
+import calendar
 import arrow
 
+# "02:30" -> (2, 30)
+def parse_tstr(tstr):
+    hrs = int(tstr[0]) * 10
+    hrs += int(tstr[1])
+
+    if not (0 <= hrs <= 23):
+        raise ValueError()
+
+    if tstr[2] != ':':
+        raise ValueError()
+
+    mins = int(tstr[3]) * 10
+    mins += int(tstr[4])
+
+    if not (0 <= mins <= 59):
+        raise ValueError()
+
+    return (hrs, mins)
+
 # class which has time information
 # downto minute
 # eg 12.12.2012 12:12:00
@@ -117,22 +138,7 @@ class RasPyTime(arrow.Arrow):
 
     # 02:30
     def _parse_tstr(self, tstr):
-        hrs = int(tstr[0]) * 10
-        hrs += int(tstr[1])
-
-        if not (0 <= hrs <= 23):
-            raise ValueError()
-
-        if tstr[2] != ':':
-            raise ValueError()
-
-        mins = int(tstr[3]) * 10
-        mins += int(tstr[4])
-
-        if not (0 <= mins <= 59):
-            raise ValueError()
-
-        return (hrs, mins)
+        return parse_tstr(tstr)
 
     def gt(self, tstr):
         h, m = self._parse_tstr(tstr)
@@ -153,3 +159,213 @@ class RasPyTime(arrow.Arrow):
     def eq(self, tstr):
         h, m = self._parse_tstr(tstr)
         return self == self.replace(hour=h, minute=m)
+
+# local time of a scheduler tick, downto minute
+# same api as RasPyTime, but the calendar fields are
+# computed once and the end of hour/day/week/month
+# on first use. anything else, eg replace() or format(),
+# is passed on to a RasPyTime of the same time
+class RasPyTick(object):
+    __slots__ = (
+        "timestamp",
+        "year",
+        "month",
+        "day",
+        "hour",
+        "minute",
+        "_weekday",
+        "_minutes",
+        "_endof",
+        "_arrow"
+    )
+
+    second = 0
+    microsecond = 0
+
+    # minutes of day by "HH:MM"
+    _tstrs = dict()
+
+    def __init__(self, timestamp):
+        lt = time.localtime(timestamp)
+        self.timestamp = int(timestamp) - lt.tm_sec
+        self.year = lt.tm_year
+        self.month = lt.tm_mon
+        self.day = lt.tm_mday
+        self.hour = lt.tm_hour
+        self.minute = lt.tm_min
+        self._weekday = lt.tm_wday
+        self._minutes = lt.tm_hour * 60 + lt.tm_min
+        self._endof = dict()
+        self._arrow = None
+
+    def __repr__(self):
+        return "<RasPyTick {:04d}-{:02d}-{:02d} {:02d}:{:02d}>".format(
+            self.year,
+            self.month,
+            self.day,
+            self.hour,
+            self.minute
+        )
+
+    # arrow api
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.to_arrow(), name)
+
+    def to_arrow(self):
+        if self._arrow is None:
+            self._arrow = RasPyTime.fromtimestamp(self.timestamp)
+        return self._arrow
+
+    # operators with arrows, datetimes and timedeltas
+    def _unwrap(self, other):
+        if isinstance(other, RasPyTick):
+            return other.to_arrow()
+        return other
+
+    def __eq__(self, other):
+        return self.to_arrow() == self._unwrap(other)
+
+    def __ne__(self, other):
+        return self.to_arrow() != self._unwrap(other)
+
+    def __lt__(self, other):
+        return self.to_arrow() < self._unwrap(other)
+
+    def __le__(self, other):
+        return self.to_arrow() <= self._unwrap(other)
+
+    def __gt__(self, other):
+        return self.to_arrow() > self._unwrap(other)
+
+    def __ge__(self, other):
+        return self.to_arrow() >= self._unwrap(other)
+
+    def __hash__(self):
+        return hash(self.timestamp)
+
+    def __add__(self, other):
+        return self.to_arrow() + other
+
+    def __radd__(self, other):
+        return other + self.to_arrow()
+
+    def __sub__(self, other):
+        return self.to_arrow() - self._unwrap(other)
+
+    def __rsub__(self, other):
+        return other - self.to_arrow()
+
+    def norm(self):
+        return self
+
+    def jstimestamp(self):
+        return self.timestamp
+
+    def weekday(self):
+        return self._weekday
+
+    def isoweekday(self):
+        return self._weekday + 1
+
+    def days_in_month(self):
+        return calendar.monthrange(self.year, self.month)[1]
+
+    # the following methods only make sense
+    # if called every minute, hour etc
+    def every_quarter(self):
+        return self.minute in (0, 15, 30, 45)
+
+    def every_half(self):
+        return self.minute in (0, 30)
+
+    def every_12hrs(self):
+        return self.minute == 0 and self.hour in (0, 12)
+
+    def every_6hrs(self):
+        return self.minute == 0 and self.hour in (0, 6, 12, 18)
+
+    def every_3hrs(self):
+        return self.minute == 0 and self.hour % 3 == 0
+
+    def quarter_past(self):
+        return self.minute == 15
+
+    def half_past(self):
+        return self.minute == 30
+
+    def quarter_to(self):
+        return self.minute == 45
+
+    def new_hour(self):
+        return self.minute == 0
+
+    def new_day(self):
+        return self._minutes == 0
+
+    def new_week(self):
+        return self._weekday == 0 and self._minutes == 0
+
+    def new_month(self):
+        return self.day == 1 and self._minutes == 0
+
+    def endof_hour(self):
+        return self.minute == 59
+
+    def endof_day(self):
+        return self._minutes == 23 * 60 + 59
+
+    def endof_week(self):
+        return self._weekday == 6 and self.endof_day()
+
+    def endof_month(self):
+        return self.day == self.days_in_month() and self.endof_day()
+
+    # timestamp of xx:59, 23:59, sun 23:59 or the
+    # last day of month 23:59, like ceil(frame).norm()
+    def get_endof(self, frame):
+        timestamp = self._endof.get(frame)
+        if timestamp is not None:
+            return timestamp
+
+        day = self.day
+        hour = 23
+        if frame == "hour":
+            hour = self.hour
+        elif frame == "week":
+            # mktime normalizes days past the month
+            day += 6 - self._weekday
+        elif frame == "month":
+            day = self.days_in_month()
+        elif frame != "day":
+            raise ValueError(frame)
+
+        timestamp = int(time.mktime(
+            (self.year, self.month, day, hour, 59, 0, 0, 0, -1)
+        ))
+        self._endof[frame] = timestamp
+        return timestamp
+
+    def _tstr_minutes(self, tstr):
+        minutes = self._tstrs.get(tstr)
+        if minutes is None:
+            hrs, mins = parse_tstr(tstr)
+            minutes = hrs * 60 + mins
+            self._tstrs[tstr] = minutes
+        return minutes
+
+    def gt(self, tstr):
+        return self._minutes > self._tstr_minutes(tstr)
+
+    def ge(self, tstr):
+        return self._minutes >= self._tstr_minutes(tstr)
+
+    def lt(self, tstr):
+        return self._minutes < self._tstr_minutes(tstr)
+
+    def le(self, tstr):
+        return self._minutes <= self._tstr_minutes(tstr)
+
+    def eq(self, tstr):
+        return self._minutes == self._tstr_minutes(tstr)
@@ -0,0 +1,494 @@
+# -*- coding: utf-8 -*-
+import os
+import struct
+import threading
+import urllib
+
+NAN = float("nan")
+
+# one tier of a series: fixed size little endian records in
+# append only chunk files "<start>.dat", every chunk covers
+# span seconds starting at a multiple of span (utc).
+# records are sorted by timestamp, so ranges are read by
+# bisecting the files instead of loading them.
+# not thread safe, see RasPyTimeSeries
+class RasPyTimeSeriesTier(object):
+
+    def __init__(self, path, fmt, span):
+        self._path = path
+        self._struct = struct.Struct(fmt)
+        self._span = span
+        # (chunk start, record) not written yet
+        self._pending = list()
+        # chunk files written since last sync
+        self._dirty = set()
+        self._last = None
+        self._restore()
+
+    def get_path(self):
+        return self._path
+
+    # timestamp of last record
+    def get_last(self):
+        return self._last
+
+    def _chunkfile(self, start):
+        return os.path.join(self._path, "{}.dat".format(start))
+
+    # sorted start times of chunk files on disk
+    def _chunks(self):
+        if not os.path.isdir(self._path):
+            return list()
+        chunks = list()
+        for filename in os.listdir(self._path):
+            name, ext = os.path.splitext(filename)
+            if ext == ".dat" and name.isdigit():
+                chunks.append(int(name))
+        chunks.sort()
+        return chunks
+
+    # last record on disk, drops torn writes of a crash
+    def _restore(self):
+        size = self._struct.size
+        for start in reversed(self._chunks()):
+            path = self._chunkfile(start)
+            filesize = os.path.getsize(path)
+            if filesize % size:
+                with open(path, "r+b") as f:
+                    f.truncate(filesize - filesize % size)
+                filesize -= filesize % size
+            if filesize == 0:
+                continue
+            with open(path, "rb") as f:
+                f.seek(filesize - size)
+                self._last = self._struct.unpack(f.read(size))[0]
+            return
+
+    def append(self, record):
+        timestamp = record[0]
+        self._pending.append((timestamp - timestamp % self._span, record))
+        self._last = timestamp
+
+    def pending(self):
+        return len(self._pending)
+
+    # writes pending records to their chunks
+    # returns number of records
+    def write(self):
+        written = 0
+        pack = self._struct.pack
+        while self._pending:
+            start = self._pending[0][0]
+            count = 0
+            for chunk, _ in self._pending:
+                if chunk != start:
+                    break
+                count += 1
+
+            if not os.path.isdir(self._path):
+                os.makedirs(self._path)
+            path = self._chunkfile(start)
+            with open(path, "ab") as f:
+                f.write("".join(
+                    pack(*record) for _, record in self._pending[:count]
+                ))
+            self._dirty.add(path)
+            del self._pending[:count]
+            written += count
+        return written
+
+    # written chunks to disk
+    def sync(self):
+        for path in self._dirty:
+            with open(path, "ab") as f:
+                os.fsync(f.fileno())
+        self._dirty.clear()
+
+    # index of first record >= timestamp
+    def _bisect(self, f, count, timestamp):
+        size = self._struct.size
+        lo = 0
+        hi = count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            f.seek(mid * size)
+            if self._struct.unpack(f.read(size))[0] < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    # records with start <= timestamp <= end, oldest first
+    # limit: only the newest limit records are read
+    def read(self, start, end, limit=None):
+        size = self._struct.size
+        unpack_from = self._struct.unpack_from
+
+        # newest first, pending records are the newest
+        pending = [
+            record for _, record in self._pending
+            if start <= record[0] <= end
+        ]
+        if limit is not None:
+            pending = pending[max(0, len(pending) - limit):]
+            limit -= len(pending)
+        parts = [pending]
+
+        for chunk in reversed(self._chunks()):
+            if limit is not None and limit <= 0:
+                break
+            if chunk + self._span <= start or chunk > end:
+                continue
+            with open(self._chunkfile(chunk), "rb") as f:
+                count = os.fstat(f.fileno()).st_size // size
+                lo = self._bisect(f, count, start)
+                hi = self._bisect(f, count, end + 1)
+                if limit is not None:
+                    lo = max(lo, hi - limit)
+                if lo >= hi:
+                    continue
+                f.seek(lo * size)
+                data = f.read((hi - lo) * size)
+            if limit is not None:
+                limit -= hi - lo
+            parts.append([
+                unpack_from(data, offset)
+                for offset in xrange(0, len(data), size)
+            ])
+
+        records = list()
+        for part in reversed(parts):
+            records.extend(part)
+        return records
+
+# history of a sample logger:
+#   minute  every sample as is, None is stored as NaN
+#   hour    [timestamp, avg, min, max, count] of every hour
+#   day     [timestamp, avg, min, max, count] of every day
+# hours and days are utc aligned and written once they are over,
+# the open ones are rebuilt from the finer tier after a restart
+class RasPyTimeSeries(object):
+    TIERS = ("minute", "hour", "day")
+    BUCKETS = dict(
+        hour=3600,
+        day=86400
+    )
+    # seconds per chunk file
+    CHUNKS = dict(
+        minute=7 * 86400,
+        hour=364 * 86400,
+        day=3640 * 86400
+    )
+    RAW_FORMAT = "<Id"
+    AGGREGATE_FORMAT = "<IdddI"
+
+    def __init__(self, path, name):
+        self._path = path
+        self._name = name
+        self._lock = threading.Lock()
+        self._tiers = dict()
+        for tier in self.TIERS:
+            self._tiers[tier] = RasPyTimeSeriesTier(
+                os.path.join(path, tier),
+                self.RAW_FORMAT if tier == "minute" else self.AGGREGATE_FORMAT,
+                self.CHUNKS[tier]
+            )
+        # open aggregates: [start, sum, min, max, count]
+        self._buckets = dict(hour=None, day=None)
+        self._last = None
+        self._restore()
+
+    def get_name(self):
+        return self._name
+
+    def get_path(self):
+        return self._path
+
+    def _restore(self):
+        last = self._tiers["minute"].get_last()
+        if last is None:
+            return
+        self._last = last
+
+        day = last - last % self.BUCKETS["day"]
+        for _, avg, minval, maxval, count in self._tiers["hour"].read(day, last):
+            self._merge("day", day, avg * count, minval, maxval, count)
+
+        hour = last - last % self.BUCKETS["hour"]
+        for _, value in self._tiers["minute"].read(hour, last):
+            if value == value:
+                self._merge("hour", hour, value, value, value, 1)
+
+    def _merge(self, tier, start, total, minval, maxval, count):
+        bucket = self._buckets[tier]
+        if bucket is None:
+            self._buckets[tier] = [start, total, minval, maxval, count]
+            return
+        bucket[1] += total
+        bucket[2] = min(bucket[2], minval)
+        bucket[3] = max(bucket[3], maxval)
+        bucket[4] += count
+
+    # closes the open bucket if timestamp is past it
+    def _roll(self, tier, timestamp):
+        bucket = self._buckets[tier]
+        if bucket is None or timestamp - bucket[0] < self.BUCKETS[tier]:
+            return
+        self._buckets[tier] = None
+
+        start, total, minval, maxval, count = bucket
+        self._tiers[tier].append((start, total / count, minval, maxval, count))
+        if tier == "hour":
+            self._merge(
+                "day",
+                start - start % self.BUCKETS["day"],
+                total,
+                minval,
+                maxval,
+                count
+            )
+
+    # timestamps have to increase, older ones are dropped
+    def append(self, timestamp, value):
+        timestamp = int(timestamp)
+        with self._lock:
+            if self._last is not None and timestamp <= self._last:
+                return False
+            self._last = timestamp
+
+            self._tiers["minute"].append(
+                (timestamp, NAN if value is None else float(value))
+            )
+
+            self._roll("hour", timestamp)
+            self._roll("day", timestamp)
+            if value is not None:
+                value = float(value)
+                # nan and inf would poison the aggregates
+                if value - value == 0.0:
+                    self._merge(
+                        "hour",
+                        timestamp - timestamp % self.BUCKETS["hour"],
+                        value,
+                        value,
+                        value,
+                        1
+                    )
+            return True
+
+    def pending(self):
+        with self._lock:
+            return sum(tier.pending() for tier in self._tiers.itervalues())
+
+    def flush(self, sync=False):
+        with self._lock:
+            written = 0
+            for tier in self._tiers.itervalues():
+                written += tier.write()
+                if sync:
+                    tier.sync()
+            return written
+
+    # minute: [[timestamp, value], ...]
+    # others: [[timestamp, avg, min, max, count], ...]
+    # including the open hour or day
+    # limit: at most the newest limit points
+    def read(self, tier, start, end, limit=None):
+        if tier not in self._tiers:
+            raise ValueError("Invalid tier: {}".format(tier))
+
+        with self._lock:
+            records = self._tiers[tier].read(start, end, limit)
+            bucket = self._buckets.get(tier)
+
+            if tier == "minute":
+                return [
+                    [ts, None if value != value else value]
+                    for ts, value in records
+                ]
+
+            # open day still lacks the open hour
+            hour = self._buckets["hour"]
+            if tier == "day" and hour is not None:
+                daystart = hour[0] - hour[0] % self.BUCKETS["day"]
+                if bucket is None:
+                    bucket = [daystart] + hour[1:]
+                else:
+                    bucket = [
+                        bucket[0],
+                        bucket[1] + hour[1],
+                        min(bucket[2], hour[2]),
+                        max(bucket[3], hour[3]),
+                        bucket[4] + hour[4]
+                    ]
+
+            points = [list(record) for record in records]
+            if bucket is not None and start <= bucket[0] <= end:
+                startts, total, minval, maxval, count = bucket
+                points.append([startts, total / count, minval, maxval, count])
+            if limit is not None:
+                points = points[max(0, len(points) - limit):]
+            return points
+
+# downsampling of RasPyTimeSeries.read() for charts,
+# count is the number of points wanted for start..end.
+# minute points are [timestamp, value], hour and day
+# points [timestamp, avg, min, max, count]
+
+# largest triangle three buckets: keeps the points which
+# shape the chart, returns points of the input, gaps are lost
+def decimate_lttb(points, count, start, end):
+    data = [p for p in points if p[1] is not None]
+    if count >= len(data) or count < 3:
+        return data
+
+    sampled = [data[0]]
+    every = float(len(data) - 2) / (count - 2)
+    a = 0
+    for i in range(count - 2):
+        # average of the next bucket
+        nlo = int((i + 1) * every) + 1
+        nhi = min(int((i + 2) * every) + 1, len(data))
+        avgx = sum(p[0] for p in data[nlo:nhi]) / float(nhi - nlo)
+        avgy = sum(p[1] for p in data[nlo:nhi]) / float(nhi - nlo)
+
+        ax = data[a][0]
+        ay = data[a][1]
+        maxarea = -1.0
+        for j in range(int(i * every) + 1, nlo):
+            area = abs(
+                (ax - avgx) * (data[j][1] - ay) -
+                (ax - data[j][0]) * (avgy - ay)
+            )
+            if area > maxarea:
+                maxarea = area
+                a = j
+        sampled.append(data[a])
+
+    sampled.append(data[-1])
+    return sampled
+
+# points by count equal time spans, empty ones are skipped
+def _time_buckets(points, count, start, end):
+    span = end - start + 1
+    buckets = list()
+    index = None
+    for p in points:
+        i = (p[0] - start) * count // span
+        if i != index:
+            index = i
+            buckets.append((start + i * span // count, list()))
+        buckets[-1][1].append(p)
+    return buckets
+
+# [timestamp, value] of min and max of every
+# count / 2 time spans, spikes survive
+def decimate_minmax(points, count, start, end):
+    aggregated = points and len(points[0]) > 2
+    sampled = list()
+    for _, bucket in _time_buckets(points, max(1, count // 2), start, end):
+        if aggregated:
+            low = min(bucket, key=lambda p: p[2])
+            high = max(bucket, key=lambda p: p[3])
+            low = [low[0], low[2]]
+            high = [high[0], high[3]]
+        else:
+            bucket = [p for p in bucket if p[1] is not None]
+            if not bucket:
+                continue
+            low = min(bucket, key=lambda p: p[1])
+            high = max(bucket, key=lambda p: p[1])
+        if low[0] == high[0]:
+            sampled.append(low)
+        elif low[0] < high[0]:
+            sampled.extend((low, high))
+        else:
+            sampled.extend((high, low))
+    return sampled
+
+# [timestamp, avg, min, max, count] of count time spans
+def decimate_avg(points, count, start, end):
+    aggregated = points and len(points[0]) > 2
+    sampled = list()
+    for timestamp, bucket in _time_buckets(points, count, start, end):
+        total = 0.0
+        samples = 0
+        minval = None
+        maxval = None
+        for p in bucket:
+            if aggregated:
+                total += p[1] * p[4]
+                samples += p[4]
+                low = p[2]
+                high = p[3]
+            elif p[1] is None:
+                continue
+            else:
+                total += p[1]
+                samples += 1
+                low = p[1]
+                high = p[1]
+            minval = low if minval is None else min(minval, low)
+            maxval = high if maxval is None else max(maxval, high)
+        if samples:
+            sampled.append([timestamp, total / samples, minval, maxval, samples])
+    return sampled
+
+DECIMATORS = dict(
+    lttb=decimate_lttb,
+    minmax=decimate_minmax,
+    avg=decimate_avg
+)
+
+# all series below path, one directory per series
+class RasPyTimeSeriesStore(object):
+
+    def __init__(self, path):
+        self._path = path
+        self._series = dict()
+        self._lock = threading.Lock()
+
+    def get_path(self):
+        return self._path
+
+    # names may contain anything, eg sensor names
+    def _series_path(self, name):
+        return os.path.join(self._path, urllib.quote(name, safe=""))
+
+    # opens or creates a series
+    def series(self, name):
+        with self._lock:
+            series = self._series.get(name)
+            if series is None:
+                series = RasPyTimeSeries(self._series_path(name), name)
+                self._series[name] = series
+            return series
+
+    # existing series or None
+    def find(self, name):
+        with self._lock:
+            series = self._series.get(name)
+        if series is not None:
+            return series
+        if not os.path.isdir(self._series_path(name)):
+            return None
+        return self.series(name)
+
+    # of this run and on disk
+    def get_names(self):
+        with self._lock:
+            names = set(self._series)
+        if os.path.isdir(self._path):
+            for dirname in os.listdir(self._path):
+                names.add(urllib.unquote(dirname))
+        return sorted(names)
+
+    # fsync is slow on sd cards, so writes only go
+    # to the os and are synced every few updates
+    def flush(self, sync=False):
+        with self._lock:
+            series = self._series.values()
+        written = 0
+        for s in series:
+            written += s.flush(sync)
+        return written
@@ -1,14 +1,223 @@
 # -*- coding: utf-8 -*-
+import time
+import calendar
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPDigestAuth
 # import xml.etree.ElementTree as ET
 import xml.etree.cElementTree as ET
+from raspysystem.raspyclock import RasPyClock
+from raspysystem.raspyhistogram import RasPyHistogram
+from raspysystem.raspythreadpool import RasPyThreadPool
 
 class FritzboxReaderError(Exception):
     def __init__(self, msg):
         Exception.__init__(self, msg)
 
+# types of response fields
+def to_text(text):
+    return text
+
+def to_int(text):
+    return int(text)
+
+def to_bool(text):
+    return int(text) != 0
+
+# 2015-08-11T10:55:05+02:00 -> unix timestamp,
+# without time zone the time is utc
+def to_timestamp(text):
+    timestamp = calendar.timegm((
+        int(text[0:4]),
+        int(text[5:7]),
+        int(text[8:10]),
+        int(text[11:13]),
+        int(text[14:16]),
+        int(text[17:19]),
+        0, 0, 0
+    ))
+    zone = text[19:]
+    if zone and zone != "Z":
+        offset = int(zone[1:3]) * 3600 + int(zone[4:6]) * 60
+        if zone[0] == "-":
+            offset = -offset
+        timestamp -= offset
+    return timestamp
+
+# parser target: text of the fields inside of the response
+class FritzboxResponseTarget(object):
+    def __init__(self, response, fields):
+        self._response = response
+        self._fields = fields
+        self._inside = False
+        self._found = False
+        self._field = None
+        self._text = list()
+        self._items = dict()
+
+    def found(self):
+        return self._found
+
+    # all fields are read
+    def done(self):
+        return self._fields is not None and len(self._items) == len(self._fields)
+
+    def get_items(self):
+        return self._items
+
+    def start(self, tag, attrib):
+        if tag == self._response:
+            self._inside = True
+            self._found = True
+        elif self._inside and self._field is None:
+            if self._fields is None or tag in self._fields:
+                self._field = tag
+                del self._text[:]
+
+    def data(self, data):
+        if self._field is not None:
+            self._text.append(data)
+
+    def end(self, tag):
+        if tag == self._response:
+            self._inside = False
+        elif tag == self._field:
+            self._items[tag] = "".join(self._text)
+            self._field = None
+
+    def close(self):
+        return self._items
+
+# decodes responses of one action. the qualified name of the
+# response is computed once and the body is parsed in chunks
+# until all fields are read, eg the device log is skipped
+class FritzboxDecoder(object):
+    CHUNK_SIZE = 1024
+
+    # fields: type by name, eg dict(NewUpTime=to_int),
+    # all fields as text if None
+    def __init__(self, service_type, action, fields=None):
+        self._response = "{{{}}}{}Response".format(service_type, action)
+        self._fields = fields
+
+    def get_fields(self):
+        return self._fields
+
+    # typed items by field name
+    def convert(self, items):
+        if self._fields is None:
+            return items
+        values = dict()
+        for name, text in items.iteritems():
+            conv = self._fields.get(name)
+            if conv is None:
+                continue
+            if not text:
+                values[name] = None
+                continue
+            try:
+                values[name] = conv(text)
+            except ValueError:
+                raise FritzboxReaderError(
+                    "Field {} is invalid: {}".format(name, text)
+                )
+        return values
+
+    def decode(self, content):
+        target = FritzboxResponseTarget(self._response, self._fields)
+        parser = ET.XMLParser(target=target)
+        try:
+            for i in xrange(0, len(content), self.CHUNK_SIZE):
+                parser.feed(content[i:i + self.CHUNK_SIZE])
+                if target.done():
+                    break
+            else:
+                parser.close()
+        except ET.ParseError as e:
+            raise FritzboxReaderError("Response is invalid: {}".format(e))
+
+        if not target.found():
+            raise FritzboxReaderError("Response is missing")
+        if not target.done() and self._fields is not None:
+            missing = set(self._fields) - set(target.get_items())
+            raise FritzboxReaderError(
+                "Fields are missing: {}".format(", ".join(sorted(missing)))
+            )
+        return self.convert(target.get_items())
+
 class FritzboxReader(object):
+    # soap call latency histogram bounds, in ms
+    LATENCY_BOUNDS = [10, 50, 100, 250, 500, 1000, 2000]
+    # kept alive connections to the box and
+    # calls which are sent at the same time
+    POOL_SIZE = 4
+
+    ENVELOPE_HEAD = (
+        "<?xml version=\"1.0\" encoding=\"utf-8\"?>"
+        "<s:Envelope "
+        "s:encodingStyle=\"http://schemas.xmlsoap.org/soap/encoding/\" "
+        "xmlns:s=\"http://schemas.xmlsoap.org/soap/envelope/\">"
+        "<s:Body>"
+        "<u:{action} xmlns:u=\"{type}\">"
+    )
+    ENVELOPE_TAIL = (
+        "</u:{action}>"
+        "</s:Body>"
+        "</s:Envelope>"
+    )
+
+    # fields of the responses by (service, action), parsing
+    # stops when they are read. all fields as text if missing
+    FIELDS = {
+        ("DeviceInfo", "GetInfo"): dict(
+            NewModelName=to_text,
+            NewSoftwareVersion=to_text,
+            NewUpTime=to_int
+        ),
+        ("UserInterface", "GetInfo"): dict(
+            NewUpgradeAvailable=to_bool
+        ),
+        ("Time", "GetInfo"): dict(
+            NewCurrentLocalTime=to_timestamp
+        ),
+        ("WANCommonInterfaceConfig", "GetTotalBytesSent"): dict(
+            NewTotalBytesSent=to_int
+        ),
+        ("WANCommonInterfaceConfig", "GetTotalBytesReceived"): dict(
+            NewTotalBytesReceived=to_int
+        ),
+        ("WANDSLInterfaceConfig", "GetInfo"): dict(
+            NewUpstreamCurrRate=to_int,
+            NewUpstreamMaxRate=to_int,
+            NewDownstreamCurrRate=to_int,
+            NewDownstreamMaxRate=to_int
+        ),
+        ("Hosts", "GetSpecificHostEntry"): dict(
+            NewIPAddress=to_text,
+            NewLeaseTimeRemaining=to_int,
+            NewInterfaceType=to_text,
+            NewActive=to_bool,
+            NewHostName=to_text
+        ),
+        ("Hosts", "X_AVM-DE_GetHostListPath"): {
+            "NewX_AVM-DE_HostListPath": to_text
+        }
+    }
+
+    # seconds a response is reused by (service, action),
+    # model, software and upgrade hardly ever change
+    CACHE_TTL = {
+        ("DeviceInfo", "GetInfo"): 60 * 60,
+        ("UserInterface", "GetInfo"): 60 * 60,
+        ("Time", "GetInfo"): 60 * 60
+    }
+    # fields of cached responses which count seconds,
+    # the time since the call is added to them
+    CACHE_CLOCKS = {
+        ("DeviceInfo", "GetInfo"): ["NewUpTime"],
+        ("Time", "GetInfo"): ["NewCurrentLocalTime"]
+    }
 
     def __init__(self, user, pw, timeout, ip):
         self._config = None
@@ -17,7 +226,36 @@ class FritzboxReader(object):
         self._user = user
         self._pw = pw
 
+        # one session for all calls: keeps connections alive and
+        # the digest auth answers the last challenge right away
+        # instead of waiting for a 401 on every call
+        self._session = requests.Session()
+        self._session.auth = HTTPDigestAuth(user, pw)
+        self._session.mount("http://", HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.POOL_SIZE
+        ))
+
+        # envelope head, tail, headers and decoder by (service type, action)
+        self._templates = dict()
+        # latency by "<service>.<action>"
+        self._latencies = dict()
+        self._errors = dict()
+        self._hits = dict()
+        self._stats_lock = threading.Lock()
+
+        # (monotonic time, items) by (service, action, params)
+        self._clock = RasPyClock()
+        self._cache = dict()
+        self._cache_lock = threading.Lock()
+
+        # independent calls of one update run at the same time,
+        # so a slow call does not delay all following calls
+        self._pool = RasPyThreadPool("fritz", self.POOL_SIZE)
+        self._pool.start()
+
         url = "http://{}:49000".format(ip)
+        self._url = url
 
         self._config = dict(
             # tr64 specs
@@ -58,61 +296,146 @@ class FritzboxReader(object):
                 type="urn:dslforum-org:service:WANCommonInterfaceConfig:1"
             )
         )
+        for name, service in self._config.iteritems():
+            service["name"] = name
+
+    def _template(self, service, action):
+        key = (service["type"], action)
+        template = self._templates.get(key)
+        if template is None:
+            template = (
+                self.ENVELOPE_HEAD.format(action=action, type=service["type"]),
+                self.ENVELOPE_TAIL.format(action=action),
+                {
+                    "Content-Type": "text/xml; charset=\"utf-8\"",
+                    "Accept": "text/xml",
+                    "Cache-Control": "no-cache",
+                    "Pragma": "no-cache",
+                    "SoapAction": "{}#{}".format(service["type"], action)
+                },
+                FritzboxDecoder(
+                    service["type"],
+                    action,
+                    self.FIELDS.get((service["name"], action))
+                )
+            )
+            self._templates[key] = template
+        return template
+
+    def _count_call(self, name, start, failed):
+        latency = (time.time() - start) * 1000.0
+        with self._stats_lock:
+            if name not in self._latencies:
+                self._latencies[name] = RasPyHistogram(self.LATENCY_BOUNDS)
+                self._errors[name] = 0
+                self._hits[name] = 0
+            self._latencies[name].add(latency)
+            if failed:
+                self._errors[name] += 1
+
+        # the box might have been rebooted:
+        # uptime and time have to be read again
+        if failed:
+            self.invalidate()
+
+    # cached items with their clocks moved on, None if expired
+    def _cached(self, service, action, params):
+        key = (service["name"], action)
+        ttl = self.CACHE_TTL.get(key)
+        if ttl is None:
+            return None
+
+        with self._cache_lock:
+            entry = self._cache.get((key, params))
+        if entry is None:
+            return None
+
+        elapsed = self._clock.monotonic() - entry[0]
+        if not (0 <= elapsed < ttl):
+            return None
+
+        items = dict(entry[1])
+        for field in self.CACHE_CLOCKS.get(key, []):
+            if items.get(field) is not None:
+                items[field] += int(elapsed)
+
+        with self._stats_lock:
+            self._hits["{}.{}".format(*key)] += 1
+        return items
+
+    def _store(self, service, action, params, items):
+        key = (service["name"], action)
+        if key not in self.CACHE_TTL:
+            return
+        with self._cache_lock:
+            self._cache[(key, params)] = (self._clock.monotonic(), items)
+
+    # next calls ask the box again
+    def invalidate(self):
+        with self._cache_lock:
+            self._cache.clear()
 
     def _exec_soapcall(self, service, action, params=str()):
-        # create request
-        req = "<?xml version=\"1.0\" encoding=\"utf-8\"?>"
-        req += "<s:Envelope "
-        req += "s:encodingStyle=\"http://schemas.xmlsoap.org/soap/encoding/\" "
-        req += "xmlns:s=\"http://schemas.xmlsoap.org/soap/envelope/\">"
-        req += "<s:Body>"
-        req += "<u:{} xmlns:u=\"{}\">{}</u:{}>".format(
-            action,
-            service["type"],
-            params,
-            action
-        )
-        req += "</s:Body>"
-        req += "</s:Envelope>"
+        items = self._cached(service, action, params)
+        if items is not None:
+            return items
 
+        # create request
+        head, tail, headers, decoder = self._template(service, action)
+        name = "{}.{}".format(service["name"], action)
 
         # send request
-        headers = dict()
-        headers["Content-Type"] = "text/xml; charset=\"utf-8\""
-        headers["Accept"] = "text/xml"
-        headers["Cache-Control"] = "no-cache"
-        headers["Pragma"] = "no-cache"
-        headers["SoapAction"] = "{}#{}".format(service["type"], action)
-        headers["Content-length"] = "{}".format(req)
-
+        start = time.time()
         try:
-            result = requests.post(
+            result = self._session.post(
                 service["url"],
-                data=req,
+                data=head + params + tail,
                 headers=headers,
                 timeout=self._timeout,
-                verify=False, # dont verify SSL certificate
-                auth=HTTPDigestAuth(self._user, self._pw)
+                verify=False # dont verify SSL certificate
             )
         except requests.exceptions.Timeout:
+            self._count_call(name, start, True)
             raise FritzboxReaderError("Timeout occured")
         except requests.exceptions.ConnectionError as e:
+            self._count_call(name, start, True)
             raise FritzboxReaderError("Connection error: {}".format(e))
 
+        self._count_call(name, start, result.status_code != 200)
         if result.status_code != 200:
             raise FritzboxReaderError("Status is not OK: {}".format(result.status_code))
 
-        # parse request
-        root = ET.fromstring(result.content)
-        search_string = ".//{{{}}}{}Response".format(service["type"], action)
-        response = root.find(search_string)
-        if response is None:
-            return None
-        items = dict()
-        for child in response:
-            items[child.tag] = child.text
+        items = decoder.decode(result.content)
+        self._store(service, action, params, items)
+        return dict(items)
 
-        return items
+    # func(*args) on the pool of the reader, eg
+    # submit(reader.devinfo_get_info)
+    def submit(self, func, *args):
+        return self._pool.submit(func, *args)
+
+    # waits for a submitted call, returns or raises like the call.
+    # reading the futures in order of submit gives the same order
+    # of results and errors as serial calls
+    def result(self, future):
+        future.wait()
+        return future.result()
+
+    # latency in ms, errors and answers from
+    # the cache by "<service>.<action>"
+    def serialize(self):
+        calls = dict()
+        with self._stats_lock:
+            for name, latency in self._latencies.iteritems():
+                call = latency.serialize()
+                call["errors"] = self._errors[name]
+                call["cached"] = self._hits[name]
+                calls[name] = call
+        return calls
+
+    def close(self):
+        self._pool.stop()
+        self._session.close()
 
     def hosts_get_specific_host_entry(self, newmac):
         return self._exec_soapcall(
@@ -121,6 +444,54 @@ class FritzboxReader(object):
             "<NewMACAddress>{}</NewMACAddress>".format(newmac)
         )
 
+    def hosts_get_host_list_path(self):
+        return self._exec_soapcall(
+            self._config["Hosts"],
+            "X_AVM-DE_GetHostListPath"
+        )
+
+    # whole host table in one download, by upper case mac.
+    # items have the names and types of GetSpecificHostEntry,
+    # eg NewActive, other fields are left out
+    def hosts_get_host_list(self):
+        r = self.hosts_get_host_list_path()
+        if r["NewX_AVM-DE_HostListPath"] is None:
+            raise FritzboxReaderError("No host list path")
+        decoder = self._template(self._config["Hosts"], "GetSpecificHostEntry")[3]
+
+        start = time.time()
+        try:
+            result = self._session.get(
+                self._url + r["NewX_AVM-DE_HostListPath"],
+                timeout=self._timeout
+            )
+        except requests.exceptions.Timeout:
+            self._count_call("Hosts.HostList", start, True)
+            raise FritzboxReaderError("Timeout occured")
+        except requests.exceptions.ConnectionError as e:
+            self._count_call("Hosts.HostList", start, True)
+            raise FritzboxReaderError("Connection error: {}".format(e))
+
+        self._count_call("Hosts.HostList", start, result.status_code != 200)
+        if result.status_code != 200:
+            raise FritzboxReaderError("Status is not OK: {}".format(result.status_code))
+
+        try:
+            root = ET.fromstring(result.content)
+        except ET.ParseError as e:
+            raise FritzboxReaderError("Host list is invalid: {}".format(e))
+
+        hosts = dict()
+        for item in root.iter("Item"):
+            mac = item.findtext("MACAddress")
+            if not mac:
+                continue
+            entry = dict()
+            for child in item:
+                entry["New" + child.tag] = child.text
+            hosts[mac.upper()] = decoder.convert(entry)
+        return hosts
+
     def wanip_get_status_info(self):
         return self._exec_soapcall(
             self._config["WANIPConnection"],
@@ -37,6 +37,9 @@ class LanDevice(object):
     def get_mac(self):
         return self._mac
 
+    def get_log(self):
+        return self._statelog
+
     def get_owner(self):
         return self._owner
 
@@ -80,6 +83,22 @@ class LanDevice(object):
             )
         )
 
+    # state and counters continue after a restart,
+    # the downtime counts like an undefined state
+    def snapshot(self):
+        return dict(
+            state=self._state,
+            ton=self._ton,
+            toff=self._toff,
+            log=self._statelog.snapshot()
+        )
+
+    def restore(self, state, timestamp, period):
+        self._state = state["state"]
+        self._ton = state["ton"]
+        self._toff = state["toff"]
+        self._statelog.restore(state["log"], timestamp, period)
+
     def update_info(self, interface, hostname, ip4, leasetime):
         # update info
         self._interface = interface
@@ -199,11 +218,15 @@ class LanDeviceCollection(RasPyCollection):
         return len(self.went_off_after(threshold)) > 0
 
 class LanDeviceControllerTask(RasPySimpleTask):
+    # in seconds, single host calls after a failed host list
+    HOSTLIST_RETRY = 60 * 60
 
     def __init__(self, parent):
         RasPySimpleTask.__init__(self, parent, "landevicectrl")
         self._devices = list()
         self._reader = None
+        # timestamp of the last failed host list
+        self._hostlist_failed = None
         # self._nmap = nmap.PortScanner()
 
     def set_reader(self, reader):
@@ -248,27 +271,81 @@ class LanDeviceControllerTask(RasPySimpleTask):
                 devtype,
                 maxlogs
             )
+            self.register_logger(mac, dev.get_log())
             self._devices.append(dev)
         return True
 
+    # devices by mac
+    def snapshot_event(self):
+        return dict(
+            devices=dict(
+                (dev.get_mac(), dev.snapshot()) for dev in self._devices
+            )
+        )
+
+    def restore_event(self, state):
+        timestamp = self.time().jstimestamp()
+        for mac, devstate in state["devices"].iteritems():
+            dev = self.get_devices().get(mac)
+            if dev is None:
+                continue
+            dev.restore(devstate, timestamp, self.period())
+        return True
+
     def report_event(self):
         return dict(
-            devices=[dev.serialize() for dev in self._devices]
+            devices=[dev.serialize() for dev in self._devices],
+            hostlist=self._hostlist_failed is None
         )
 
+    # host table by mac, None if only single hosts can be read
+    def _get_hostlist(self, timestamp):
+        if (
+            self._hostlist_failed is not None and
+            timestamp - self._hostlist_failed < self.HOSTLIST_RETRY
+        ):
+            return None
+        try:
+            hosts = self._reader.hosts_get_host_list()
+        except FritzboxReaderError as e:
+            self.loge("Failed to get host list, reading single hosts: {}".format(e))
+            self._hostlist_failed = timestamp
+            return None
+        self._hostlist_failed = None
+        return hosts
+
+    # one call for all devices, devices missing in the
+    # host table are read one by one at the same time
     def run_event(self):
         timestamp = self.time().jstimestamp()
+        hosts = self._get_hostlist(timestamp)
+
+        # single host calls by mac
+        futures = dict()
+        for dev in self._devices:
+            if hosts is not None and dev.get_mac().upper() in hosts:
+                continue
+            futures[dev.get_mac()] = self._reader.submit(
+                self._reader.hosts_get_specific_host_entry,
+                dev.get_mac()
+            )
 
+        # in order of devices
         for dev in self._devices:
 
             try:
-                r = self._reader.hosts_get_specific_host_entry(dev.get_mac())
-                dev.update(timestamp, int(r["NewActive"]) == 1)
+                future = futures.get(dev.get_mac())
+                if future is None:
+                    r = hosts[dev.get_mac().upper()]
+                else:
+                    r = self._reader.result(future)
+                dev.update(timestamp, r["NewActive"] == True)
                 dev.update_info(
                     r["NewInterfaceType"],
                     r["NewHostName"],
                     r["NewIPAddress"],
-                    int(r["NewLeaseTimeRemaining"])
+                    # not part of the host table
+                    r.get("NewLeaseTimeRemaining") or 0
                 )
             except FritzboxReaderError as e:
                 self.loge("Failed get get host {} because {}".format(dev.get_mac(), e))
@@ -25,6 +25,8 @@ class FritzTask(RasPyTask):
         windows = [5, 15, 60]
         self._tx = RasPyBitRate(self.period(), maxlogs, windows)
         self._rx = RasPyBitRate(self.period(), maxlogs, windows)
+        self.register_logger("dsl.tx", self._tx.get_log())
+        self.register_logger("dsl.rx", self._rx.get_log())
 
         self._txrate_max = 0
         self._rxrate_max = 0
@@ -37,19 +39,19 @@ class FritzTask(RasPyTask):
     def get_fbreader(self):
         return self._fbreader
 
-    def _update_traffic(self):
+    def _update_traffic(self, frx, ftx, fdsl):
         time = self.time()
 
         try:
-            rrx = self._fbreader.wanif_get_total_bytes_received()
-            rx_bytes = int(rrx["NewTotalBytesReceived"])
+            rrx = self._fbreader.result(frx)
+            rx_bytes = rrx["NewTotalBytesReceived"]
         except fritzbox.FritzboxReaderError as e:
             self.loge("Failed to get rx bytes: {}".format(e))
             rx_bytes = None
 
         try:
-            rtx = self._fbreader.wanif_get_total_bytes_sent()
-            tx_bytes = int(rtx["NewTotalBytesSent"])
+            rtx = self._fbreader.result(ftx)
+            tx_bytes = rtx["NewTotalBytesSent"]
         except fritzbox.FritzboxReaderError as e:
             self.loge("Failed to get tx bytes: {}".format(e))
             tx_bytes = None
@@ -58,39 +60,50 @@ class FritzTask(RasPyTask):
         self._tx.log(time.jstimestamp(), tx_bytes)
 
         try:
-            r = self._fbreader.wandslif_get_info()
-            self._txrate_max = int(r["NewUpstreamCurrRate"])
-            self._txrate_limit = int(r["NewUpstreamMaxRate"])
-            self._rxrate_max = int(r["NewDownstreamCurrRate"])
-            self._rxrate_limit = int(r["NewDownstreamMaxRate"])
+            r = self._fbreader.result(fdsl)
+            self._txrate_max = r["NewUpstreamCurrRate"]
+            self._txrate_limit = r["NewUpstreamMaxRate"]
+            self._rxrate_max = r["NewDownstreamCurrRate"]
+            self._rxrate_limit = r["NewDownstreamMaxRate"]
         except fritzbox.FritzboxReaderError as e:
             self.loge("Failed to get dsl info: {}".format(e))
 
     # disconnection safe
     def run_event(self):
+        reader = self._fbreader
+
+        # all calls are independent: send them at the same time
+        # and read the results in order, an update takes as long
+        # as the slowest call instead of the sum of all calls.
+        # device, upgrade and time info come from the cache of the
+        # reader most of the time, uptime and time keep counting
+        fdevinfo = reader.submit(reader.devinfo_get_info)
+        fuserif = reader.submit(reader.userif_get_info)
+        ftime = reader.submit(reader.time_get_info)
+        frx = reader.submit(reader.wanif_get_total_bytes_received)
+        ftx = reader.submit(reader.wanif_get_total_bytes_sent)
+        fdsl = reader.submit(reader.wandslif_get_info)
+
         # the following calls always return valid data
         # if there is a network connection
         try:
-            r = self._fbreader.devinfo_get_info()
-            self._uptime =  int(r["NewUpTime"])
+            r = reader.result(fdevinfo)
+            self._uptime = r["NewUpTime"]
             self._modelname = r["NewModelName"]
             self._software = r["NewSoftwareVersion"]
         except fritzbox.FritzboxReaderError as e:
             self.loge("Failed to get device info: {}".format(e))
 
         try:
-            r = self._fbreader.userif_get_info()
-            self._upgrade = int(r["NewUpgradeAvailable"]) == 1
+            r = reader.result(fuserif)
+            self._upgrade = r["NewUpgradeAvailable"]
         except fritzbox.FritzboxReaderError as e:
             self.loge("Failed to get upgrade info: {}".format(e))
 
         try:
-            r = self._fbreader.time_get_info()
-            local_time = r["NewCurrentLocalTime"]
-            # time in DateTime: convert to timestamp
-            # 2015-08-11T10:55:05+02:00
-            local_time = self.kernel().get_timefactory().get(local_time)
-            self._fritz_time = local_time.timestamp
+            # DateTime is converted to a timestamp by the reader
+            r = reader.result(ftime)
+            self._fritz_time = r["NewCurrentLocalTime"]
         except fritzbox.FritzboxReaderError as e:
             self.loge("Failed to get localtime info: {}".format(e))
 
@@ -103,7 +116,19 @@ class FritzTask(RasPyTask):
 
 
         # traffic information is reset after reconnect
-        self._update_traffic()
+        self._update_traffic(frx, ftx, fdsl)
+        return True
+
+    def snapshot_event(self):
+        return dict(
+            tx=self._tx.snapshot(),
+            rx=self._rx.snapshot()
+        )
+
+    def restore_event(self, state):
+        timestamp = self.time().jstimestamp()
+        self._tx.restore(state["tx"], timestamp)
+        self._rx.restore(state["rx"], timestamp)
         return True
 
     def report_event(self):
@@ -127,7 +152,8 @@ class FritzTask(RasPyTask):
                     ratemax=self._rxrate_max,
                     ratelimit=self._rxrate_limit
                 )
-            )
+            ),
+            soap=self._fbreader.serialize()
         )
 
     def startup_event(self, db, cfg):
@@ -140,3 +166,7 @@ class FritzTask(RasPyTask):
 
         self["landevicectrl"].set_reader(self._fbreader)
         return True
+
+    def shutdown_event(self):
+        if self._fbreader is not None:
+            self._fbreader.close()
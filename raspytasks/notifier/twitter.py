@@ -3,6 +3,7 @@ import requests
 import tweepy
 from raspysystem.raspysamplelogger import RasPySampleLogger
 from raspysystem.raspytask import RasPySimpleTask
+from raspysystem.raspyschedule import RasPySchedule
 
 # import raspytasks.fritz.landevice
 import raspytasks.sensor.sensor
@@ -44,6 +45,9 @@ class TwitterTask(RasPySimpleTask):
 
     def __init__(self, parent):
         RasPySimpleTask.__init__(self, parent, "twitter")
+        self.add_dependencies(["supply", "weather", "sensor"])
+        # every hour
+        self.set_schedule(RasPySchedule("0"))
 
         self._active = True
         self._tweepy = None
@@ -97,7 +101,7 @@ class TwitterTask(RasPySimpleTask):
     def run_event(self):
         time = self.time()
 
-        if not time.new_hour() or not self._active:
+        if not self._active:
             return True
 
         msg = unicode()
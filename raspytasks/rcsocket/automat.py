@@ -50,6 +50,7 @@ class AutomatControllerTask(RasPySimpleTask):
 
     def __init__(self, parent):
         RasPySimpleTask.__init__(self, parent, "automatctrl")
+        self.add_dependencies(["rcsocket", "fritz", "sensor", "weather"])
         self._automats = list()
         self._scriptenv = None
 
@@ -22,7 +22,7 @@ class Socket(object):
         address,
         period,
         maxlogs,
-        db_path,
+        database,
         db_prefix
     ):
 
@@ -43,7 +43,7 @@ class Socket(object):
         self._prms = prms
         self._meter = RasPyEnergyMeter(
             period,
-            db_path,
+            database,
             db_prefix
         )
         self._log = RasPySampleLogger(maxlogs)
@@ -72,6 +72,9 @@ class Socket(object):
     def get_meter(self):
         return self._meter
 
+    def get_log(self):
+        return self._log
+
     def switch_auto(self, state, automat, msg):
         self._automat = automat
         self._automat_msg = msg
@@ -265,9 +268,15 @@ class SocketControllerTask(RasPySimpleTask):
                 address,
                 self.period(),
                 maxlogs,
-                self.kernel().get_databasepath(),
+                self.kernel().get_database(
+                    RasPyEnergyMeter.DBFILE.format(self.period())
+                ),
                 "socket{}".format(len(self._sockets))
             )
+            self.register_logger(address, socket.get_log())
+            meter = socket.get_meter()
+            self.register_logger(address + ".energy.hour", meter.get_hour_log())
+            self.register_logger(address + ".energy.day", meter.get_day_log())
             self._sockets.append(socket)
 
         # 3) register requests
@@ -298,6 +307,24 @@ class SocketControllerTask(RasPySimpleTask):
             self._switch_all_sockets(time, self._force_all)
         return True
 
+    # logs by address
+    def snapshot_event(self):
+        return dict(
+            logs=dict(
+                (so.get_address(), so.get_log().snapshot())
+                for so in self._sockets
+            )
+        )
+
+    def restore_event(self, state):
+        timestamp = self.time().jstimestamp()
+        for address, log in state["logs"].iteritems():
+            socket = self.get_sockets().get(address)
+            if socket is None:
+                continue
+            socket.get_log().restore(log, timestamp, self.period())
+        return True
+
     def report_event(self):
         return dict(
             sockets=[so.serialize() for so in self._sockets],
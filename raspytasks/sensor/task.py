@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 from raspysystem.raspytask import RasPyTask
+from raspysystem.raspyschedule import RasPySchedule
 from sensor import Sensor
 from temp import SensorDS18B20
 from light import SensorDummyLight
@@ -14,6 +15,8 @@ class SensorTask(RasPyTask):
 
     def __init__(self, parent):
         RasPyTask.__init__(self, parent, "sensor")
+        # every 15min
+        self.set_schedule(RasPySchedule("*/15"))
 
         self._maxlogs = self.kernel().get_updates24h() / 15
         self._sensors = dict()
@@ -97,8 +100,11 @@ class SensorTask(RasPyTask):
                     ))
                     return False
 
-                self._sensors[stype][slocation][sname] = (
-                    self._drivers[stype][sdriver](sdriverinfo)
+                sensor = self._drivers[stype][sdriver](sdriverinfo)
+                self._sensors[stype][slocation][sname] = sensor
+                self.register_logger(
+                    "{}.{}.{}".format(stype, slocation, sname),
+                    sensor.get_log()
                 )
             else:
                 self.loge("Unsupported driver: {}".format(sdriver))
@@ -109,16 +115,35 @@ class SensorTask(RasPyTask):
     def run_event(self):
         time = self.time()
 
-        # every 15min
-        if not time.every_quarter():
-            return True
-
         for stype in self._sensors:
             for sloc in self._sensors[stype]:
                 for sname in self._sensors[stype][sloc]:
                     self._sensors[stype][sloc][sname].update(time)
         return True
 
+    # logs by (type, location, name)
+    def snapshot_event(self):
+        logs = dict()
+        for stype in self._sensors:
+            for sloc in self._sensors[stype]:
+                for sname in self._sensors[stype][sloc]:
+                    sensor = self._sensors[stype][sloc][sname]
+                    logs[(stype, sloc, sname)] = sensor.get_log().snapshot()
+        return dict(logs=logs)
+
+    def restore_event(self, state):
+        timestamp = self.time().jstimestamp()
+        # logged every 15min
+        period = 15 * self.period()
+        for key, log in state["logs"].iteritems():
+            stype, sloc, sname = key
+            sensor = self._sensors.get(stype, dict()).get(sloc, dict()).get(sname)
+            # removed from database meanwhile
+            if sensor is None:
+                continue
+            sensor.get_log().restore(log, timestamp, period)
+        return True
+
     def report_event(self):
         output = dict()
         for stype in self._sensors:
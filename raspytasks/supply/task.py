@@ -21,12 +21,19 @@ class SupplyTask(RasPyTask):
         self._vlog = RasPySampleLogger(maxlogs, windows)
         self._ilog = RasPySampleLogger(maxlogs, windows)
         self._plog = RasPySampleLogger(maxlogs, windows)
+        self.register_logger("voltage", self._vlog)
+        self.register_logger("current", self._ilog)
+        self.register_logger("power", self._plog)
 
         self._energy_meter = RasPyEnergyMeter(
             self.period(),
-            self.kernel().get_databasepath(),
+            self.kernel().get_database(
+                RasPyEnergyMeter.DBFILE.format(self.period())
+            ),
             "supply"
         )
+        self.register_logger("energy.hour", self._energy_meter.get_hour_log())
+        self.register_logger("energy.day", self._energy_meter.get_day_log())
 
     def get_vlog(self):
         return self._vlog
@@ -75,6 +82,20 @@ class SupplyTask(RasPyTask):
         self._energy_meter.update(time, p)
         return True
 
+    def snapshot_event(self):
+        return dict(
+            voltage=self._vlog.snapshot(),
+            current=self._ilog.snapshot(),
+            power=self._plog.snapshot()
+        )
+
+    def restore_event(self, state):
+        timestamp = self.time().jstimestamp()
+        self._vlog.restore(state["voltage"], timestamp, self.period())
+        self._ilog.restore(state["current"], timestamp, self.period())
+        self._plog.restore(state["power"], timestamp, self.period())
+        return True
+
     def report_event(self):
         return dict(
             energy=self._energy_meter.serialize(),
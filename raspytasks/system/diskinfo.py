@@ -21,6 +21,8 @@ class DiskInfoTask(RasPySimpleTask):
         maxlogs = self.kernel().get_updates24h()
         self.write_rate = RasPyByteRate(self.period(), maxlogs)
         self.read_rate = RasPyByteRate(self.period(), maxlogs)
+        self.register_logger("write", self.write_rate.get_log())
+        self.register_logger("read", self.read_rate.get_log())
 
     def startup_event(self, db, cfg):
         if not self._config_expect(["rootpartition"], cfg):
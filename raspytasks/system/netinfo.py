@@ -11,6 +11,8 @@ class NetInfoTask(RasPySimpleTask):
         maxlogs = self.kernel().get_updates24h()
         self.tx = RasPyBitRate(self.period(), maxlogs)
         self.rx = RasPyBitRate(self.period(), maxlogs)
+        self.register_logger("tx", self.tx.get_log())
+        self.register_logger("rx", self.rx.get_log())
 
     def run_event(self):
         timestamp = self.time().jstimestamp()
@@ -14,6 +14,7 @@ class OSInfoTask(RasPySimpleTask):
             self.kernel().get_updates24h(),
             windows
         )
+        self.register_logger("usage", self._usagelog)
 
         # system
         self._unixkernel = None
@@ -172,6 +173,19 @@ class OSInfoTask(RasPySimpleTask):
         self._update_cpu_usage()
         return True
 
+    def snapshot_event(self):
+        return dict(
+            usage=self._usagelog.snapshot()
+        )
+
+    def restore_event(self, state):
+        self._usagelog.restore(
+            state["usage"],
+            self.time().jstimestamp(),
+            self.period()
+        )
+        return True
+
     def report_event(self):
         return dict(
             usage=self._usagelog.serialize(),
@@ -180,7 +194,8 @@ class OSInfoTask(RasPySimpleTask):
             uptime=self._uptime,
             idletime=self._idletime,
             loadavg=self._loadavg,
-            cpus=self._cpus,
+            # copy, cpu dicts get updated in place
+            cpus=[dict(cpu) for cpu in self._cpus],
             hardware=self._hardware,
             revision=self._revision,
             overclocked=self._overclocked
@@ -62,6 +62,22 @@ class PIDController(object):
     def get_ref(self):
         return self._ref
 
+    # reference and controller memory, see restore()
+    def snapshot(self):
+        return dict(
+            ref=self._ref,
+            esum=self._esum,
+            dinput=self._dinput,
+            last_input=self._last_input
+        )
+
+    # after set_coeff() and set_limit(), they reset
+    def restore(self, state):
+        self._ref = state["ref"]
+        self._esum = state["esum"]
+        self._dinput = state["dinput"]
+        self._last_input = state["last_input"]
+
     def compute(self, value):
 
         e = self._ref - value
@@ -121,6 +137,10 @@ class TempControlTask(RasPySimpleTask):
         maxlogs = self.kernel().get_updates24h()
         self._templog = RasPySampleLogger(maxlogs, windows)
         self._speedlog = RasPySampleLogger(maxlogs, windows)
+        self.register_logger("temperature", self._templog)
+        self.register_logger("fanspeed", self._speedlog)
+        # pid state of the last run, applied after calibration
+        self._pidstate = None
 
         self._minspeed = 0
         self._minpwm = 0
@@ -263,11 +283,6 @@ class TempControlTask(RasPySimpleTask):
         # 19.2 / 32 = 600KHz - Also starts the PWM
         wiringpi2.pwmSetClock(self.PWM_CLK_DIV)
 
-        self.logd("Finding minimum fan speed...")
-        if not self._find_minspeed():
-            return False
-        self.logd("Minimum fan speed: {}%".format(self._minspeed))
-
         self.set_highest_profile()
         # self.set_profile(40)
         if not self.add_requests([
@@ -279,6 +294,17 @@ class TempControlTask(RasPySimpleTask):
 
         return True
 
+    # spinning the fan takes a few seconds
+    def warmup_event(self):
+        self.logd("Finding minimum fan speed...")
+        if not self._find_minspeed():
+            return False
+        self.logd("Minimum fan speed: {}%".format(self._minspeed))
+        if self._pidstate is not None:
+            self._pid.restore(self._pidstate)
+            self._pidstate = None
+        return True
+
     def run_event(self):
         time = self.time()
 
@@ -326,6 +352,22 @@ class TempControlTask(RasPySimpleTask):
             return False
         return True
 
+    def snapshot_event(self):
+        return dict(
+            temp=self._templog.snapshot(),
+            speed=self._speedlog.snapshot(),
+            ecomode=self._ecomode,
+            pid=self._pid.snapshot()
+        )
+
+    def restore_event(self, state):
+        timestamp = self.time().jstimestamp()
+        self._templog.restore(state["temp"], timestamp, self.period())
+        self._speedlog.restore(state["speed"], timestamp, self.period())
+        self._ecomode = state["ecomode"]
+        self._pidstate = state["pid"]
+        return True
+
     def report_event(self):
         return dict(
             temp=self._templog.serialize(),
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import googlemaps
 from raspysystem.raspytask import RasPyTask
+from raspysystem.raspyschedule import RasPySchedule
 from raspysystem.raspysamplelogger import RasPySampleLogger
 from raspysystem.raspyenergymeter import RasPyEnergyMeter
 
@@ -82,6 +83,12 @@ class Direction(object):
         self._routes_driving = list()
         self._routes_transit = list()
 
+    def get_routes(self):
+        return dict(
+            driving=self._routes_driving,
+            transit=self._routes_transit
+        )
+
     def update_routes(self, routes):
         self._routes_driving = routes["driving"]
         self._routes_transit = routes["transit"]
@@ -133,19 +140,22 @@ class TrafficTask(RasPyTask):
 
     def __init__(self, parent):
         RasPyTask.__init__(self, parent, "traffic")
+        # every 15min, off the quarters of the other tasks
+        self.set_schedule(RasPySchedule("7/15", initial=True))
 
         self._gmaps = None
         self._updates = 0
         self._synctime = None
         self._directions = list()
 
+    # overload
+    # retry on every update until routes were read once
+    def due(self, time):
+        return self._updates == 0 or RasPyTask.due(self, time)
+
     def run_event(self):
         time = self.time()
 
-        # every 15min
-        if not time.every_quarter() and (self._updates!=0):
-            return True
-
         # for each destination
         for di in self._directions:
 
@@ -213,6 +223,31 @@ class TrafficTask(RasPyTask):
         self._synctime = time.jstimestamp()
         return True
 
+    # routes by (from, to, mode)
+    def snapshot_event(self):
+        return dict(
+            updates=self._updates,
+            synctime=self._synctime,
+            routes=dict(
+                (
+                    (di.get_from(), di.get_to(), di.get_mode()),
+                    di.get_routes()
+                )
+                for di in self._directions
+            )
+        )
+
+    def restore_event(self, state):
+        self._updates = state["updates"]
+        self._synctime = state["synctime"]
+        for di in self._directions:
+            routes = state["routes"].get(
+                (di.get_from(), di.get_to(), di.get_mode())
+            )
+            if routes is not None:
+                di.update_routes(routes)
+        return True
+
     def report_event(self):
         return dict(
             updates=self._updates,
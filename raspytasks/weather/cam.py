@@ -20,6 +20,7 @@ import pygame.transform
 
 
 from raspysystem.raspytask import RasPySimpleTask
+from raspysystem.raspyschedule import RasPySchedule
 from cam_tools  import Skydetector
 
 class PingPongFile(object):
@@ -415,11 +416,12 @@ class CameraProcessor(object):
             return self._thread.is_alive()
         return False
 
-    def process(self, online, description, imgtime):
-        self._thread = threading.Thread(target=self.run, args=(online, description, imgtime))
+    # done() is called by the processing thread
+    def process(self, online, description, imgtime, done=None):
+        self._thread = threading.Thread(target=self.run, args=(online, description, imgtime, done))
         self._thread.start()
 
-    def run(self, online, description, imgtime):
+    def run(self, online, description, imgtime, done=None):
         render_time = time.time()
         if online:
             self._draw_online()
@@ -436,6 +438,9 @@ class CameraProcessor(object):
         else:
             self._store_image_offline()
 
+        if done is not None:
+            done()
+
 
 class CameraTask(RasPySimpleTask):
     SUMMARY_MAXLEN = 30
@@ -447,6 +452,8 @@ class CameraTask(RasPySimpleTask):
 
     def __init__(self, parent):
         RasPySimpleTask.__init__(self, parent, "cam")
+        # new image every 15min
+        self.set_schedule(RasPySchedule("*/15"))
 
 
         # self._b64history = deque(maxlen=self.TIMELAPSE_LENGTH)
@@ -470,6 +477,16 @@ class CameraTask(RasPySimpleTask):
     def get_video_online(self):
         return self._video_online
 
+    def _is_online(self, time):
+        return time.ge("06:00") and time.lt("18:00")
+
+    # called by camera processing thread
+    def _processed(self):
+        self._online_file = self._camera_process.get_online_file()
+        self._offline_file = self._camera_process.get_online_file()
+        self._video_file = self._camera_process.get_online_file()
+        self.set_dirty()
+
     def get_image_file(self):
         if self._video_online:
             return self._online_file.read()
@@ -556,25 +573,20 @@ class CameraTask(RasPySimpleTask):
                 small = ImageFont.truetype(font_files[1], self.FONT_SIZE_SMALL)
             )
         )
+        return True
+
+    # writes all images and the video once
+    def warmup_event(self):
         self.logd("Creating initial data")
         self._camera_process.initial()
+        self._processed()
+        self._video_online = self._is_online(self.time())
         return True
 
     def run_event(self):
         time = self.time()
 
-        # always check if image generation is done
-        if not self._camera_process.processing():
-            self._online_file = self._camera_process.get_online_file()
-            self._offline_file = self._camera_process.get_online_file()
-            self._video_file = self._camera_process.get_online_file()
-
-        # always set video_online state
-        self._video_online = time.ge("06:00") and time.lt("18:00")
-
-        # generate webcam image every 15min
-        if not time.every_quarter():
-            return True
+        self._video_online = self._is_online(time)
 
         description = unicode()
 
@@ -596,7 +608,7 @@ class CameraTask(RasPySimpleTask):
             else:
                 ton = time.replace(hour=6,minute=0)
 
-            ton = ton.humanize(time, locale="de")
+            ton = ton.humanize(time.to_arrow(), locale="de")
             description = "Online {}".format(ton)
 
         # start processing
@@ -604,7 +616,12 @@ class CameraTask(RasPySimpleTask):
             self.loge("camera processing is still running")
             return False
 
-        self._camera_process.process(self._video_online, description, time)
+        self._camera_process.process(
+            self._video_online,
+            description,
+            time,
+            self._processed
+        )
         return True
 
 
@@ -6,6 +6,7 @@ import ssl
 from requests.auth import HTTPBasicAuth
 
 from raspysystem.raspytask import RasPySimpleTask
+from raspysystem.raspyschedule import RasPySchedule
 from raspysystem.raspycollection import RasPyCollection
 from raspysystem.raspysamplelogger import RasPySampleLogger
 
@@ -177,6 +178,8 @@ class ForecastIOTask(RasPySimpleTask):
 
     def __init__(self, parent):
         RasPySimpleTask.__init__(self, parent, "forecast")
+        # every 15min, first update right away
+        self.set_schedule(RasPySchedule("*/15", initial=True))
 
         # log some values
         # we only store very 15min so maxlogs/15
@@ -184,6 +187,9 @@ class ForecastIOTask(RasPySimpleTask):
         self._logtemp = RasPySampleLogger(maxlogs)
         self._logclouds = RasPySampleLogger(maxlogs)
         self._logpreci = RasPySampleLogger(maxlogs)
+        self.register_logger("temperature", self._logtemp)
+        self.register_logger("clouds", self._logclouds)
+        self.register_logger("precipitation", self._logpreci)
 
 
         self._updates = 0
@@ -192,6 +198,8 @@ class ForecastIOTask(RasPySimpleTask):
         self._hourly = None
         self._daily = None
         self._alerts = list()
+        # last response, kept for a restart
+        self._wdata = None
 
         self._apikey = None
         self._timeout = None
@@ -209,6 +217,11 @@ class ForecastIOTask(RasPySimpleTask):
     def valid(self):
         return self._updates > 0
 
+    # overload
+    # retry on every update until there is a forecast
+    def due(self, time):
+        return self._updates == 0 or RasPySimpleTask.due(self, time)
+
     def get_updates(self):
         return self._updates
 
@@ -260,7 +273,11 @@ class ForecastIOTask(RasPySimpleTask):
         # parse result
         self._updates += 1
         self._synctime = time.jstimestamp()
+        self._parse_weather(wdata)
+        return True
 
+    def _parse_weather(self, wdata):
+        self._wdata = wdata
         tf = self.kernel().get_timefactory()
 
         self._currently = None
@@ -291,8 +308,6 @@ class ForecastIOTask(RasPySimpleTask):
                     Alert(tf, alert)
                 )
 
-        return True
-
     def startup_event(self, db, cfg):
         if not self._config_expect(["location", "apikey"], cfg):
             return False
@@ -302,11 +317,6 @@ class ForecastIOTask(RasPySimpleTask):
 
     def run_event(self):
         time = self.time()
-
-        # every 15min
-        if not time.every_quarter() and (self._updates!=0):
-            return True
-
         jstime = time.jstimestamp()
         temp = None
         clouds = None
@@ -331,6 +341,30 @@ class ForecastIOTask(RasPySimpleTask):
 
         return True
 
+    def snapshot_event(self):
+        return dict(
+            temp=self._logtemp.snapshot(),
+            clouds=self._logclouds.snapshot(),
+            preci=self._logpreci.snapshot(),
+            updates=self._updates,
+            synctime=self._synctime,
+            wdata=self._wdata
+        )
+
+    def restore_event(self, state):
+        timestamp = self.time().jstimestamp()
+        # logged every 15min
+        period = 15 * self.period()
+        self._logtemp.restore(state["temp"], timestamp, period)
+        self._logclouds.restore(state["clouds"], timestamp, period)
+        self._logpreci.restore(state["preci"], timestamp, period)
+
+        if state["wdata"] is not None:
+            self._updates = state["updates"]
+            self._synctime = state["synctime"]
+            self._parse_weather(state["wdata"])
+        return True
+
     def report_event(self):
         return dict(
             logs=dict(
@@ -5,7 +5,8 @@ from cam import CameraTask
 
 
 class WeatherTask(RasPyTask):
-
+    # no own report, subtasks mark themselves dirty
+    DIRTY_ON_RUN = False
 
     def __init__(self, parent):
         RasPyTask.__init__(self, parent, "weather")
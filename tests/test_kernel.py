@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+# python -m unittest discover -s tests
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+import simplejson as json
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from raspysystem.raspykernel import RasPyKernel
+from raspysystem.raspythreadpool import RasPyThreadPool
+from raspysystem.raspytime import RasPyTick
+
+
+class FakeServer(object):
+    def serialize(self):
+        return dict()
+
+
+# runs until it is released
+class FakeTask(object):
+    def __init__(self, name):
+        self._name = name
+        self._runs = 0
+        self.released = threading.Event()
+        self.released.set()
+
+    def get_name(self):
+        return self._name
+
+    def get_dependencies(self):
+        return list()
+
+    def get_elevated(self):
+        return False
+
+    def due(self, time):
+        return True
+
+    def get_version(self):
+        return self._runs
+
+    def get_runtime(self):
+        return 0.0
+
+    def process_requests(self):
+        pass
+
+    def get_requests_simple(self):
+        return list()
+
+    def report(self):
+        return dict(runs=self._runs)
+
+    def run(self):
+        self.released.wait()
+        self._runs += 1
+        return True
+
+
+# report shares its list with the task
+class SharedTask(FakeTask):
+    def __init__(self, name):
+        FakeTask.__init__(self, name)
+        self._values = list()
+
+    def report(self):
+        return dict(values=self._values)
+
+    def run(self):
+        self._runs += 1
+        self._values.append(self._runs)
+        return True
+
+
+class RasPyKernelTest(unittest.TestCase):
+
+    def setUp(self):
+        self._path = tempfile.mkdtemp()
+        self._kernel = RasPyKernel(self._path, False)
+        self._kernel._server = FakeServer()
+        self._kernel._taskpool = RasPyThreadPool("task", 2)
+        self._kernel._taskpool.start()
+        self._kernel._tasktimeout = 0.2
+        self._start = int(time.time()) // 60 * 60
+
+    def tearDown(self):
+        self._kernel._taskpool.stop(wait=False)
+        shutil.rmtree(self._path)
+
+    def update(self, index):
+        kernel = self._kernel
+        kernel._current_update = RasPyTick(self._start + index * 60)
+        kernel.get_time = lambda: kernel._current_update
+        return kernel._scheduler_update()
+
+    def report(self, task, timestamp=0, delta=False):
+        result = self._kernel._execute_query(None, json.dumps(dict(
+            type="REPORT",
+            task=task,
+            timestamp=timestamp,
+            delta=delta
+        )))
+        self.assertEqual(result[:3], RasPyKernel.ERR_NONE)
+        return json.loads(result[3:])
+
+    def test_busy_on_first_update(self):
+        slow = FakeTask("slow")
+        slow.released.clear()
+        self._kernel.add_task(slow)
+        self._kernel.add_task(FakeTask("fast"))
+
+        self.assertTrue(self.update(0))
+        cache = self.report("slow")
+        self.assertIsNone(cache["report"])
+        self.assertTrue(cache["info"]["stale"])
+        self.assertEqual(self.report("fast")["report"], dict(runs=1))
+
+        slow.released.set()
+        time.sleep(0.1)
+        # finished the first run and ran again
+        self.assertTrue(self.update(1))
+        cache = self.report("slow")
+        self.assertEqual(cache["report"], dict(runs=2))
+        self.assertFalse(cache["info"]["stale"])
+
+    def test_busy_over_two_updates(self):
+        slow = FakeTask("slow")
+        slow.released.clear()
+        self._kernel.add_task(slow)
+
+        self.assertTrue(self.update(0))
+        first = self.report("slow")
+        self.assertIsNone(first["report"])
+        self.assertTrue(self.update(1))
+        self.assertIsNone(self.report("slow")["report"])
+
+        slow.released.set()
+        time.sleep(0.1)
+        self.assertTrue(self.update(2))
+        # delta from the first null report has to set the root
+        delta = self.report("slow", first["info"]["timestamp"], True)
+        self.assertEqual(delta["patch"], [["set", [], dict(runs=2)]])
+
+    def test_disabled_task(self):
+        self._kernel.add_task(FakeTask("fast"))
+        self.assertTrue(self.update(0))
+        for query in [
+            dict(type="REPORT", task="twitter", timestamp=0),
+            dict(type="REPORT", task="twitter", timestamp=0, delta=True),
+            dict(type="REQUEST", task="twitter", timestamp=0,
+                 command="mode", arguments="{}")
+        ]:
+            self.assertEqual(
+                self._kernel._execute_query(None, json.dumps(query)),
+                RasPyKernel.ERR_INVALID_QUERY
+            )
+
+    def test_shared_report(self):
+        self._kernel.add_task(SharedTask("shared"))
+        self.assertTrue(self.update(0))
+        first = self.report("shared")
+        self.assertEqual(first["report"], dict(values=[1]))
+
+        self.assertTrue(self.update(1))
+        delta = self.report("shared", first["info"]["timestamp"], True)
+        self.assertEqual(delta["patch"], [["push", ["values"], [2], 0]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+# python -m unittest discover -s tests
+import os
+import sys
+import unittest
+from collections import deque
+import simplejson as json
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from raspysystem.raspysamplelogger import RasPyRingBuffer, RasPySampleLogger
+
+SEPARATORS = (",", ":")
+
+# values as loggers get them
+CASES = dict(
+    ints=[3, -1, 0, None, 7],
+    floats=[0.5, None, 2.25, -1.0],
+    mixed=[1, 2, 3.5, None, 4, 0.25, 7],
+    bools=[True, False, None, True],
+    boolints=[True, 2, False, 1.5, None],
+    large=[1, 2**40, None, 3, -2**45],
+    huge=[1, 2**70, 2.5, None],
+    largefloat=[2**60, 1.5, 2]
+)
+
+
+def dumps(value):
+    return json.dumps(value, separators=SEPARATORS)
+
+
+class RasPyRingBufferTest(unittest.TestCase):
+
+    # same output as the deque based buffer
+    def check(self, values, maxlen):
+        ring = RasPyRingBuffer(maxlen)
+        ring.to_json()
+        reference = deque(maxlen=maxlen)
+        for value in values:
+            ring.append(value)
+            reference.append(value)
+            self.assertEqual(dumps(ring.to_list()), dumps(list(reference)))
+            # cached json is updated by every append
+            self.assertEqual(ring.to_json().encoded_json, dumps(list(reference)))
+            self.assertEqual(dumps(ring[-1]), dumps(reference[-1]))
+
+    def test_cases(self):
+        for name, values in CASES.items():
+            for maxlen in (3, 10, 100):
+                self.check(values * 6, maxlen)
+
+    def test_clear(self):
+        ring = RasPyRingBuffer(4)
+        ring.append(1.5)
+        ring.append(True)
+        ring.clear()
+        ring.append(1)
+        self.assertEqual(dumps(ring.to_list()), "[1]")
+
+
+class RasPySampleLoggerTest(unittest.TestCase):
+
+    def test_serialize(self):
+        for name, values in CASES.items():
+            logger = RasPySampleLogger(10, [3, 5])
+            samples = deque(maxlen=10)
+            for i, value in enumerate(values * 4):
+                logger.log(i * 60, value)
+                samples.append(value)
+                output = json.loads(dumps(logger.serialize()))
+                self.assertEqual(
+                    dumps(output["samples"]),
+                    dumps(list(samples))
+                )
+                self.assertEqual(dumps(output["last"]), dumps(value))
+
+    # averages recover once the sample left the windows
+    def test_nonfinite(self):
+        for bad in (float("nan"), float("inf"), float("-inf")):
+            logger = RasPySampleLogger(10, [3, 5])
+            logger.log(0, 1.0)
+            logger.log(60, bad)
+            output = json.loads(dumps(logger.serialize()))
+            self.assertEqual(output["samples"], [1.0, None])
+            self.assertEqual(logger.get_averages(), [1.0, 1.0, 1.0])
+            for i in range(10):
+                logger.log((i + 2) * 60, 2.0)
+            self.assertEqual(logger.get_averages(), [2.0, 2.0, 2.0])
+
+
+if __name__ == "__main__":
+    unittest.main()